@@ -0,0 +1,185 @@
+"""HTTP API для интеграции с LMS.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Авторизация - заголовок "Authorization: Bearer vyud_..." или "X-API-Key: vyud_...".
+Выдать ключ:  python -c "import auth; print(auth.create_api_key('user@example.com'))"
+Загрузка файла - тело запроса как есть:  curl -T lecture.pdf -H "X-API-Key: ..." ".../v1/files?name=lecture.pdf"
+Файл живет до завершения задачи, которая его использует (без задачи - VYUD_UPLOAD_TTL_HOURS, по умолчанию сутки).
+Генерация асинхронная: POST /v1/quizzes -> job_id, затем GET /v1/jobs/{id} или SSE /v1/jobs/{id}/events.
+Задачи и файлы лежат в общей SQLite (jobs.py), поэтому любой воркер отвечает про любую задачу.
+"""
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import uuid
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+import auth
+import jobs
+import logic
+import metrics
+import question_bank
+import quiz_store
+import scratch
+
+MAX_UPLOAD_MB = int(os.environ.get("VYUD_MAX_UPLOAD_MB", "500"))
+SSE_INTERVAL = 1.0
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    os.makedirs(jobs.UPLOAD_DIR, exist_ok=True)
+    scratch.sweep()
+    jobs.start_workers()
+    yield
+
+app = FastAPI(title="VYUD AI API", version="1.0", lifespan=lifespan)
+
+async def current_user(authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
+    key = x_api_key or (authorization or "").removeprefix("Bearer ").strip()
+    email = await run_in_threadpool(auth.check_api_key, key)
+    if not email: raise HTTPException(401, "invalid API key")
+    return email
+
+# --- ФАЙЛЫ ---
+@app.api_route("/v1/files", methods=["POST", "PUT"], status_code=201)
+async def upload_file(request: Request, name: str, user: str = Depends(current_user)):
+    """Тело запроса читается потоком прямо с сокета и пишется на диск кусками, хэш считается по ходу.
+    Лимит проверяется по Content-Length до чтения и по счетчику байт во время - без буферизации всего тела"""
+    ext = name.rsplit(".", 1)[-1].lower()
+    if ext not in logic.DOC_EXTENSIONS + logic.MEDIA_EXTENSIONS:
+        raise HTTPException(415, f"unsupported file type .{ext}")
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise HTTPException(413, f"file larger than {MAX_UPLOAD_MB} MB")
+    path = os.path.join(jobs.UPLOAD_DIR, f"{uuid.uuid4().hex}.{ext}")
+    h, size = hashlib.sha256(), 0
+    try:
+        with open(path, "wb") as out:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit: raise HTTPException(413, f"file larger than {MAX_UPLOAD_MB} MB")
+                h.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        # open() мог упасть до создания файла - не подменяем исходную ошибку FileNotFoundError
+        with contextlib.suppress(FileNotFoundError): os.remove(path)
+        raise
+    if not size:
+        os.remove(path)
+        raise HTTPException(400, "empty body")
+    metrics.inc("vyud_upload_bytes_total", size, source="api")
+    file_id = await run_in_threadpool(jobs.add_file, user, name, path, h.hexdigest(), size)
+    return {"file_id": file_id, "name": name, "size": size, "sha256": h.hexdigest()}
+
+# --- ЗАДАЧИ ---
+class ExtractRequest(BaseModel):
+    file_id: str
+
+class GenerateRequest(BaseModel):
+    file_id: str
+    num_questions: int = Field(5, ge=1, le=20)
+    difficulty: str = "Medium"
+    language: str = "Russian"
+    topic: Optional[str] = None
+    title: Optional[str] = None
+    hints: bool = True
+    bank: bool = False
+
+async def _submit(user, kind, params):
+    if not await run_in_threadpool(jobs.get_file, params["file_id"], user):
+        raise HTTPException(404, "file not found")
+    job_id = await run_in_threadpool(jobs.submit, user, kind, params)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.post("/v1/extract", status_code=202)
+async def extract(req: ExtractRequest, user: str = Depends(current_user)):
+    return await _submit(user, "extract", req.dict())
+
+@app.post("/v1/quizzes", status_code=202)
+async def generate(req: GenerateRequest, user: str = Depends(current_user)):
+    if await run_in_threadpool(auth.get_user_credits, user) <= 0:
+        raise HTTPException(402, "not enough credits")
+    return await _submit(user, "generate", req.dict())
+
+def _public(job):
+    return {k: job[k] for k in ("job_id", "kind", "status", "stage", "progress", "result", "error", "created_at", "updated_at")}
+
+@app.get("/v1/jobs/{job_id}")
+async def job_status(job_id: str, user: str = Depends(current_user)):
+    job = await run_in_threadpool(jobs.get, job_id, user)
+    if not job: raise HTTPException(404, "job not found")
+    return _public(job)
+
+@app.get("/v1/jobs/{job_id}/events")
+async def job_events(job_id: str, user: str = Depends(current_user)):
+    """Server-Sent Events: событие при каждом изменении стадии/прогресса, последнее - done/failed"""
+    if not await run_in_threadpool(jobs.get, job_id, user): raise HTTPException(404, "job not found")
+
+    async def stream():
+        last = None
+        while True:
+            job = _public(await run_in_threadpool(jobs.get, job_id))
+            state = (job["status"], job["stage"], job["progress"])
+            if state != last:
+                last = state
+                yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+            if job["status"] in jobs.TERMINAL: return
+            await asyncio.sleep(SSE_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# --- РЕЗУЛЬТАТЫ ---
+async def _quiz(share_id):
+    stored = await run_in_threadpool(quiz_store.load_quiz, share_id)
+    if not stored: raise HTTPException(404, "quiz not found")
+    return stored
+
+@app.get("/v1/quizzes/{share_id}")
+async def get_quiz(share_id: str, user: str = Depends(current_user)):
+    stored = await _quiz(share_id)
+    return {"share_id": share_id, "title": stored["title"], "hints": stored["hints"], **stored["quiz"].to_dict()}
+
+@app.get("/v1/quizzes/{share_id}/html")
+async def quiz_html(share_id: str, user: str = Depends(current_user)):
+    stored = await _quiz(share_id)
+    return Response(logic.create_html_quiz(stored["quiz"], stored["title"]), media_type="text/html; charset=utf-8")
+
+@app.get("/v1/quizzes/{share_id}/scorm")
+async def quiz_scorm(share_id: str, user: str = Depends(current_user)):
+    stored = await _quiz(share_id)
+    data = await run_in_threadpool(logic.create_scorm_package, stored["quiz"], stored["title"])
+    return Response(data, media_type="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="scorm_{share_id}.zip"'})
+
+@app.get("/v1/banks/{bank_id}/sample")
+async def bank_sample(bank_id: str, seed: Optional[int] = None, user: str = Depends(current_user)):
+    bank = await run_in_threadpool(question_bank.load_bank, bank_id)
+    if not bank: raise HTTPException(404, "bank not found")
+    return {"bank_id": bank_id, "title": bank["title"],
+            **question_bank.sample(bank["pool"], bank["sample_size"], seed).to_dict()}
+
+class CertificateRequest(BaseModel):
+    student_name: str = Field(..., max_length=200)
+    course_name: str = Field(..., max_length=200)
+
+@app.post("/v1/certificates")
+async def certificate(req: CertificateRequest, user: str = Depends(current_user)):
+    pdf = await run_in_threadpool(logic.create_certificate, req.student_name, req.course_name)
+    return StreamingResponse(io.BytesIO(pdf), media_type="application/pdf",
+                             headers={"Content-Disposition": 'attachment; filename="certificate.pdf"'})
+
+# --- СЛУЖЕБНОЕ ---
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus():
+    return metrics.render_prometheus()
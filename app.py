@@ -1,11 +1,97 @@
 import streamlit as st
 import logic
 import auth
+import quiz_store
+import question_bank
+import jobs
+import metrics
+import usage
+import routing
 import os
+import io
+import hashlib
+import datetime
 import pandas as pd
 
 # 1. КОНФИГУРАЦИЯ
 st.set_page_config(page_title="VYUD AI", page_icon="��", layout="wide")
+metrics.serve()  # /metrics на METRICS_PORT, если задан
+jobs.start_workers()  # генерация идет в фоновых потоках, скрипт только опрашивает статус
+
+APP_URL = os.environ.get("APP_URL", "https://app.vyud.online")
+
+# 1.1 КЭШ ЭКСПОРТА
+# Ключ - имя, курс, хэши картинок, ID сертификата и дата: ввод в соседние поля не перерисовывает PDF.
+# ID и дата задаются снаружи (ID - свой на сессию, имя и курс), иначе кэш раздал бы один сертификат всем
+def asset_hash(f):
+    return hashlib.sha256(f.getvalue()).hexdigest() if f else None
+
+def certificate_id(name, course):
+    ids = st.session_state.setdefault('cert_ids', {})
+    return ids.setdefault((name, course), logic.certificate_id())
+
+@st.cache_data(show_spinner=False, max_entries=64, ttl=3600)
+def render_certificate(name, course, logo_hash, signature_hash, cert_id, issued, _logo_bytes=None, _signature_bytes=None):
+    logo = io.BytesIO(_logo_bytes) if _logo_bytes else None
+    signature = io.BytesIO(_signature_bytes) if _signature_bytes else None
+    return logic.create_certificate(name, course, logo, signature, cert_id, issued)
+
+# 1.2 СЕССИЯ ТЕСТА
+def reset_answers():
+    for k in [k for k in st.session_state if isinstance(k, str) and k[:1] == "q" and k[1:].isdigit()]:
+        del st.session_state[k]
+
+def open_quiz(quiz, hints, title, share_id=None):
+    st.session_state['q'] = quiz
+    st.session_state['h'] = hints
+    st.session_state['fn'] = title
+    st.session_state['share_id'] = share_id
+    st.session_state['bank_id'] = None
+    st.session_state['bank'] = None
+    st.session_state['done'] = False
+    st.session_state['score'] = 0
+    reset_answers()
+
+def open_bank(bank):
+    # Пул держим в сессии: пересдача - только новая выборка, без БД и API
+    open_quiz(question_bank.sample(bank['pool'], bank['sample_size']), bank['hints'], bank['title'])
+    st.session_state['bank_id'] = bank['bank_id']
+    st.session_state['bank'] = (bank['pool'], bank['sample_size'])
+
+def new_attempt():
+    if st.session_state.get('bank'):
+        pool, n = st.session_state['bank']
+        st.session_state['q'] = question_bank.sample(pool, n)
+    st.session_state['done'] = False
+    st.session_state['score'] = 0
+    reset_answers()
+
+# 1.3 ФОНОВАЯ ГЕНЕРАЦИЯ
+# job_id в сессии, задача в jobs.db: перезапуск скрипта не прерывает работу,
+# результат подхватывается фрагментом, который опрашивает статус раз в JOB_POLL секунд
+JOB_POLL = 2
+STAGE_LABELS = {"queued": "В очереди...", "started": "Запуск...", "extract": "Извлекаем текст...",
+                "generate": "Генерируем вопросы...", "hints": "Готовим подсказки методиста...", "save": "Сохраняем..."}
+
+def open_job_result(result):
+    st.query_params.clear()
+    if result.get('bank_id'):
+        bank = question_bank.load_bank(result['bank_id'])
+        if bank: open_bank(bank); st.query_params["bank"] = bank['bank_id']
+    else:
+        stored = quiz_store.load_quiz(result['share_id'])
+        if stored: open_quiz(stored['quiz'], stored['hints'], stored['title'], result['share_id']); st.query_params["quiz"] = result['share_id']
+
+@st.fragment(run_every=JOB_POLL)
+def job_progress():
+    job = jobs.get(st.session_state['job_id'])
+    if job and job['status'] not in jobs.TERMINAL:
+        st.progress(job['progress'] or 0.0, text=STAGE_LABELS.get(job['stage'], job['stage']))
+        return
+    st.session_state['job_id'] = None
+    if job and job['status'] == "done": open_job_result(job['result'])
+    else: st.session_state['job_error'] = job['error'] if job else "Задача не найдена"
+    st.rerun()
 
 # 2. CSS
 st.markdown("""
@@ -61,6 +147,24 @@ else:
         if st.button("Выход", use_container_width=True): 
             st.session_state['user']=None; st.rerun()
 
+        try: my_quizzes = quiz_store.list_quizzes(st.session_state['user'], 5)
+        except: my_quizzes = []
+        if my_quizzes:
+            st.markdown("### 📚 Мои тесты")
+            for mq in my_quizzes: st.markdown(f"[{mq['title']}](?quiz={mq['share_id']})")
+
+    # 5.1 ТЕСТ ПО ССЫЛКЕ (?quiz=ID / ?bank=ID) - одно чтение из БД вместо генерации
+    shared_id = st.query_params.get("quiz")
+    if shared_id and st.session_state.get('share_id') != shared_id:
+        stored = quiz_store.load_quiz(shared_id)
+        if stored: open_quiz(stored['quiz'], stored['hints'], stored['title'], shared_id)
+        else: st.warning("Тест по ссылке не найден.")
+    shared_bank = st.query_params.get("bank")
+    if shared_bank and st.session_state.get('bank_id') != shared_bank:
+        bank = question_bank.load_bank(shared_bank)
+        if bank: open_bank(bank)
+        else: st.warning("Банк вопросов по ссылке не найден.")
+
 
     st.title("Генератор Обучения AI 🧠")
     
@@ -72,26 +176,40 @@ else:
         with c1: diff = st.radio("Сложность", ["Easy", "Medium", "Hard"])
         with c2: lang = st.selectbox("Язык", ["Russian", "English", "Kazakh", "Uzbek", "Kyrgyz", "Turkish"])
         with c3: cnt = st.slider("Вопросы", 1, 20, 5)
+        topic = st.text_input("Тема теста (необязательно)", placeholder="Например: работа на высоте").strip() or None
+        bank_mode = st.checkbox(f"🎲 Банк вопросов (x{question_bank.BANK_FACTOR}): каждая пересдача и каждый студент получают новый вариант без доплаты")
 
-        if st.button("🚀 Создать тест", type="primary"):
-            if auth.get_user_credits(st.session_state['user']) > 0:
-                with st.spinner("Анализ..."):
-                    try:
-                        txt = logic.process_file_to_text(uf, st.secrets["OPENAI_API_KEY"])
-                        st.session_state['q'] = logic.generate_quiz_ai(txt, cnt, diff, lang)
-                        st.session_state['h'] = logic.generate_methodologist_hints(txt, lang)
-                        st.session_state['fn'] = uf.name
-                        st.session_state['done'] = False
-                        st.session_state['score'] = 0
-                        auth.deduct_credit(st.session_state['user'])
-                        st.rerun()
-                    except Exception as e: st.error(f"Error: {e}")
+        if st.button("🚀 Создать тест", type="primary", disabled=bool(st.session_state.get('job_id'))):
+            chash = quiz_store.content_hash(uf.getvalue())
+            pkey = quiz_store.params_key(cnt, diff, lang, topic)
+            stored = question_bank.find_bank(chash, pkey) if bank_mode else quiz_store.find_quiz(chash, pkey)
+            if stored:
+                # Тот же файл с теми же настройками уже генерировали - кредит не списываем
+                st.query_params.clear()
+                if bank_mode:
+                    open_bank(stored); st.query_params["bank"] = stored['bank_id']
+                else:
+                    open_quiz(stored['quiz'], stored['hints'], uf.name, stored['share_id']); st.query_params["quiz"] = stored['share_id']
+                st.rerun()
+            elif auth.get_user_credits(st.session_state['user']) > 0:
+                file_id = jobs.store_upload(st.session_state['user'], uf.name, uf)
+                st.session_state['job_id'] = jobs.submit(st.session_state['user'], "generate", {
+                    "file_id": file_id, "num_questions": cnt, "difficulty": diff, "language": lang,
+                    "topic": topic, "title": uf.name, "hints": True, "bank": bank_mode})
+                st.session_state['job_error'] = None
             else: st.error("Недостаточно кредитов! Пополните баланс в меню слева.")
 
+    if st.session_state.get('job_id'): job_progress()
+    if st.session_state.get('job_error'): st.error(f"Error: {st.session_state['job_error']}")
+
     if st.session_state.get('q'):
         st.divider()
         if st.session_state.get('h'):
             with st.expander("💡 Подсказки Методолога", expanded=True): st.info(st.session_state['h'])
+        if st.session_state.get('share_id'):
+            with st.expander("🔗 Поделиться тестом"): st.code(f"{APP_URL}/?quiz={st.session_state['share_id']}")
+        if st.session_state.get('bank_id'):
+            with st.expander("🔗 Поделиться банком (у каждого свой вариант)"): st.code(f"{APP_URL}/?bank={st.session_state['bank_id']}")
 
         q = st.session_state['q']
         if not st.session_state.get('done'):
@@ -107,6 +225,7 @@ else:
                     st.session_state['score'] = s
                     if s >= len(q.questions)*0.7: st.session_state['done'] = True; st.rerun()
                     else: st.error(f"Не сдал: {s}/{len(q.questions)}")
+            if st.session_state.get('bank') and st.button("🎲 Другой вариант"): new_attempt(); st.rerun()
         else:
             st.success(f"Сдано! Результат: {st.session_state['score']}")
             st.subheader("📜 Сертификат / Экспорт")
@@ -119,14 +238,21 @@ else:
                 course = st.text_input("Название курса", value=d_c)
             
             try:
-                pdf = logic.create_certificate(name, course, logo_file, signature_file)
+                pdf = render_certificate(
+                    name, course, asset_hash(logo_file), asset_hash(signature_file),
+                    certificate_id(name, course), datetime.date.today(),
+                    logo_file.getvalue() if logo_file else None,
+                    signature_file.getvalue() if signature_file else None,
+                )
                 st.download_button("📥 Скачать Сертификат (PDF)", pdf, "cert.pdf", "application/pdf", type="primary")
             except Exception as e: st.error(f"Ошибка PDF: {e}")
             
             try: st.download_button("🌐 Скачать Тест (HTML Offline)", logic.create_html_quiz(q, st.session_state['fn']), "quiz.html", "text/html")
             except: pass
+            try: st.download_button("📦 Скачать для LMS (SCORM 1.2)", logic.create_scorm_package(q, st.session_state['fn']), "quiz_scorm.zip", "application/zip")
+            except: pass
 
-            if st.button("Заново"): st.session_state['done']=False; st.rerun()
+            if st.button("Заново"): new_attempt(); st.rerun()
 
     st.divider()
     st.markdown("""<div style="background-color:#f0f9ff; padding:15px; border-radius:10px; border:1px solid #bae6fd">
@@ -137,6 +263,12 @@ else:
         st.divider(); st.subheader("🛡️ Админ Панель")
         if st.button("🔴 ПЕРЕЗАГРУЗИТЬ СЕРВЕР (Update Code)"): os.system("pkill -9 -f streamlit")
              
+        if st.button("📊 Расход API по пользователям"):
+            try: st.dataframe(pd.DataFrame(usage.summary()))
+            except Exception as e: st.error(f"Ошибка БД: {e}")
+            st.caption("Маршруты моделей (с момента запуска процесса)")
+            st.dataframe(pd.DataFrame(routing.stats()))
+
         if st.button("Показать пользователей"):
             try:
                 data = auth.supabase.table('users_credits').select("*").execute()
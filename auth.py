@@ -1,11 +1,23 @@
 from supabase import create_client
 import streamlit as st
 import hashlib
+import secrets
 import sqlite3
 import os
+import time
+import metrics
+import usage
+import resilience
 
 DB_FILE = "users.db"
 
+# Supabase: таймаут на запрос, 2 попытки в пределах дедлайна, после 3 сбоев подряд
+# цепь размыкается на 30 с - все вызовы сразу уходят в SQLite, не подвешивая поток
+SUPABASE_TIMEOUT = 5
+SUPABASE_DEADLINE = 8.0
+supabase_breaker = resilience.breaker("supabase", failure_threshold=3, reset_timeout=30.0)
+_supabase_client = None
+
 def init_db():
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
@@ -37,14 +49,17 @@ def register_user(email, password):
         try:
             supabase = get_supabase()
             if supabase:
-                supabase.table("users_credits").insert({"email": email, "credits": 5}).execute()
-        except:
-            pass
+                supabase_call("register", lambda: supabase.table("users_credits").insert({"email": email, "credits": 5}).execute())
+        except Exception as e:
+            metrics.log_event("supabase_fallback", op="register", error=str(e)[:200])
         return True
     except:
         return False
 
 def get_supabase():
+    # Клиент один на процесс - раньше создавался на каждый вызов
+    global _supabase_client
+    if _supabase_client: return _supabase_client
     try:
         url = st.secrets.get("SUPABASE_URL")
         key = st.secrets.get("SUPABASE_KEY")
@@ -53,17 +68,27 @@ def get_supabase():
         key = os.environ.get("SUPABASE_KEY")
     if not url or not key:
         return None
-    return create_client(url, key)
+    try:
+        from supabase.lib.client_options import ClientOptions
+        _supabase_client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
+    except ImportError:
+        _supabase_client = create_client(url, key)
+    return _supabase_client
+
+def supabase_call(op, fn):
+    """Запрос к Supabase через breaker/retry; при открытой цепи - CircuitOpenError сразу"""
+    with metrics.span("supabase", op=op):
+        return resilience.call(fn, "supabase", deadline=resilience.Deadline(SUPABASE_DEADLINE), attempts=2)
 
 def get_user_credits(email):
     try:
         supabase = get_supabase()
         if supabase:
-            result = supabase.table("users_credits").select("credits").eq("email", email).execute()
+            result = supabase_call("get_credits", lambda: supabase.table("users_credits").select("credits").eq("email", email).execute())
             if result.data and len(result.data) > 0:
                 return result.data[0]["credits"]
-    except:
-        pass
+    except Exception as e:
+        metrics.log_event("supabase_fallback", op="get_credits", error=str(e)[:200])
     try:
         init_db()
         conn = sqlite3.connect(DB_FILE)
@@ -75,23 +100,43 @@ def get_user_credits(email):
     except:
         return 0
 
-def deduct_credit(email, amount=1):
+def deduct_credit(email, amount=1, job_id=None):
+    """Списанная сумма или None, если списать не удалось.
+    Без job_id - списывает amount. С job_id amount игнорируется: сумма - по фактическим расходам
+    задачи из леджера usage. В обоих случаях не больше текущего баланса (в минус не уводим)"""
+    if job_id: amount = usage.job_credits(job_id)
+    amount = max(0, min(amount, get_user_credits(email)))
+    if job_id:
+        # Сначала запись в леджер (уникальна на job_id): задачу, запущенную повторно, второй раз не списываем
+        try:
+            if not usage.record_charge(email, job_id, amount): return usage.job_charge(job_id)
+        except sqlite3.Error as e:
+            metrics.log_event("ledger_error", error=str(e))
+    if _deduct(email, amount): return amount
+    if job_id:
+        try: usage.cancel_charge(job_id)
+        except sqlite3.Error: pass
+    return None
+
+def _deduct(email, amount):
     try:
         supabase = get_supabase()
         if supabase:
             current = get_user_credits(email)
             if current >= amount:
-                supabase.table("users_credits").update({"credits": current - amount}).eq("email", email).execute()
+                supabase_call("deduct_credit", lambda: supabase.table("users_credits").update({"credits": current - amount}).eq("email", email).execute())
+                metrics.inc("vyud_credits_charged_total", amount, backend="supabase")
                 return True
-    except:
-        pass
+    except Exception as e:
+        metrics.log_event("supabase_fallback", op="deduct_credit", error=str(e)[:200])
     try:
         init_db()
         conn = sqlite3.connect(DB_FILE)
         c = conn.cursor()
-        c.execute("UPDATE users_credits SET credits = credits - ? WHERE email=?", (amount, email))
+        c.execute("UPDATE users_credits SET credits = MAX(credits - ?, 0) WHERE email=?", (amount, email))
         conn.commit()
         conn.close()
+        metrics.inc("vyud_credits_charged_total", amount, backend="sqlite")
         return True
     except:
         return False
@@ -100,16 +145,58 @@ def add_credits(email, amount):
     try:
         supabase = get_supabase()
         if supabase:
-            result = supabase.table("users_credits").select("credits").eq("email", email).execute()
+            result = supabase_call("get_credits", lambda: supabase.table("users_credits").select("credits").eq("email", email).execute())
             if result.data and len(result.data) > 0:
                 new_balance = result.data[0]["credits"] + amount
-                supabase.table("users_credits").update({"credits": new_balance}).eq("email", email).execute()
+                supabase_call("add_credits", lambda: supabase.table("users_credits").update({"credits": new_balance}).eq("email", email).execute())
             else:
-                supabase.table("users_credits").insert({"email": email, "credits": amount}).execute()
+                supabase_call("add_credits", lambda: supabase.table("users_credits").insert({"email": email, "credits": amount}).execute())
+            metrics.inc("vyud_credits_added_total", amount)
         return True
     except:
         return False
 
+# --- API-КЛЮЧИ (HTTP API для LMS) ---
+# В базе только sha256 ключа; сам ключ показывается один раз при создании
+API_KEY_PREFIX = "vyud_"
+
+def init_api_keys():
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("""CREATE TABLE IF NOT EXISTS api_keys
+                 (key_hash TEXT PRIMARY KEY, email TEXT, name TEXT, created_at REAL, revoked INTEGER DEFAULT 0)""")
+    conn.commit()
+    conn.close()
+
+def create_api_key(email, name=""):
+    init_api_keys()
+    key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("INSERT INTO api_keys VALUES (?, ?, ?, ?, 0)", (hash_pass(key), email, name, time.time()))
+    conn.commit()
+    conn.close()
+    return key
+
+def check_api_key(key):
+    """email владельца ключа или None"""
+    if not key or not key.startswith(API_KEY_PREFIX): return None
+    init_api_keys()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT email FROM api_keys WHERE key_hash=? AND revoked=0", (hash_pass(key),))
+    res = c.fetchone()
+    conn.close()
+    return res[0] if res else None
+
+def revoke_api_key(key):
+    init_api_keys()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("UPDATE api_keys SET revoked=1 WHERE key_hash=?", (hash_pass(key),))
+    conn.commit()
+    conn.close()
+
 class MockSupabaseClient:
     def table(self, name): return self
     def select(self, *args): return self
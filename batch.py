@@ -0,0 +1,259 @@
+"""Пакетная генерация тестов через OpenAI Batch API (ночные прогоны по библиотеке курсов).
+
+    python batch.py run  course_library/ --work batch_work/      # собрать, отправить, дождаться, разобрать
+    python batch.py status --work batch_work/
+    python batch.py collect --work batch_work/                   # только забрать готовые результаты
+
+Состояние хранится в <work>/state.json: после перезапуска работа продолжается с того же шага
+(отправленные документы не отправляются повторно; новые документы в том же каталоге уходят следующим батчем). Для тестов - OPENAI_BASE_URL на bench/fake_openai.py.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+import logic
+import metrics
+import quality
+import routing
+import textprep
+import usage
+from models import Quiz
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+BATCH_PRICE_FACTOR = 0.5   # Batch API - половина цены
+POLL_INTERVAL = 30
+TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+# --- СОСТОЯНИЕ ---
+# docs: {doc_id: {path, status, batch_id?}}, статусы документа: queued -> submitted -> done | failed;
+# batches: {batch_id: {status, input_file_id, output_file_id, error_file_id, docs, collected}}.
+# Тело запроса каждого документа - в <work>/requests/<doc_id>.json: входной JSONL батча
+# собирается заново из queued-документов, поэтому custom_id в нем не повторяется.
+def _state_path(work):
+    return os.path.join(work, "state.json")
+
+def load_state(work):
+    try:
+        with open(_state_path(work), encoding="utf-8") as f: state = json.load(f)
+    except FileNotFoundError:
+        return {"docs": {}, "batches": {}}
+    if "batch_id" in state:
+        # Старый формат: один батч на каталог
+        bid = state.pop("batch_id")
+        docs = [cid for cid, d in state["docs"].items() if d["status"] == "queued"]
+        for cid in docs: state["docs"][cid].update(status="submitted", batch_id=bid)
+        state["batches"] = {bid: {"status": state.get("status"), "input_file_id": state.get("input_file_id"),
+                                  "output_file_id": state.get("output_file_id"), "error_file_id": state.get("error_file_id"),
+                                  "docs": docs, "collected": False}}
+    state.setdefault("batches", {})
+    return state
+
+def save_state(work, state):
+    os.makedirs(work, exist_ok=True)
+    tmp = _state_path(work) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _state_path(work))
+
+def _request_path(work, cid):
+    return os.path.join(work, "requests", f"{cid}.json")
+
+def _open_batches(state):
+    return [bid for bid, b in state["batches"].items() if b["status"] not in TERMINAL]
+
+def doc_id(path):
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+def find_documents(paths):
+    exts = set(logic.DOC_EXTENSIONS) | set(logic.MEDIA_EXTENSIONS)
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                for name in sorted(files):
+                    if name.rsplit(".", 1)[-1].lower() in exts: yield os.path.join(root, name)
+        elif os.path.isfile(p):
+            yield p
+
+# --- 1. ЗАПРОСЫ ---
+def build_request(custom_id, text, num_questions, difficulty, language):
+    text = logic.prepare_text(text, logic.QUIZ_TOKEN_BUDGET, "quiz")
+    route = routing.route("quiz", textprep.count_tokens(text, logic.MODEL_GPT), difficulty)
+    prompt = logic.build_quiz_prompt(text, num_questions, difficulty, language)
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT,
+            "body": {"model": route.model, "messages": [{"role": "user", "content": prompt}],
+                     "response_format": {"type": "json_object"}}}
+
+def build_requests(work, paths, num_questions=5, difficulty="Medium", language="Russian"):
+    """Извлекает текст и пишет тело запроса каждого нового документа; уже известные пропускает"""
+    state = load_state(work)
+    os.makedirs(os.path.join(work, "requests"), exist_ok=True)
+    for path in find_documents(paths):
+        cid = doc_id(path)
+        if cid in state["docs"]: continue
+        text = logic.extract_text_from_path(path)
+        if not text or text.startswith("Error"):
+            state["docs"][cid] = {"path": path, "status": "extract_failed", "error": (text or "")[:200]}
+        else:
+            with open(_request_path(work, cid), "w", encoding="utf-8") as f:
+                json.dump(build_request(cid, text, num_questions, difficulty, language), f, ensure_ascii=False)
+            state["docs"][cid] = {"path": path, "status": "queued"}
+        save_state(work, state)
+    return state
+
+# --- 2. ОТПРАВКА И ОЖИДАНИЕ ---
+def _find_batch(client, input_file_id, limit=500):
+    """Уже созданный батч с этим входным файлом (процесс упал между create и save_state)"""
+    for i, batch in enumerate(client.batches.list(limit=100)):
+        if batch.input_file_id == input_file_id: return batch
+        if i >= limit: break
+    return None
+
+def submit(work, client):
+    """Новый батч из всех queued-документов (их может быть несколько за время жизни каталога).
+    Перед созданием батча в state пишется pending (файл + документы): после падения батч
+    ищется по input_file_id, а не создается второй раз"""
+    state = load_state(work)
+    pending = state.get("pending")
+    if not pending:
+        queued = [cid for cid, d in state["docs"].items() if d["status"] == "queued"]
+        if not queued: return state
+        input_path = os.path.join(work, f"batch_input_{len(state['batches']) + 1}.jsonl")
+        with open(input_path, "w", encoding="utf-8") as out:
+            for cid in queued:
+                with open(_request_path(work, cid), encoding="utf-8") as f: out.write(f.read().strip() + "\n")
+        with open(input_path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        pending = state["pending"] = {"input_file_id": uploaded.id, "docs": queued}
+        save_state(work, state)
+        batch = None
+    else:
+        batch = _find_batch(client, pending["input_file_id"])
+        if batch: metrics.log_event("batch_resumed", batch_id=batch.id)
+    if batch is None:
+        batch = client.batches.create(input_file_id=pending["input_file_id"], endpoint=BATCH_ENDPOINT,
+                                      completion_window=COMPLETION_WINDOW)
+    docs = pending["docs"]
+    state["batches"][batch.id] = {"status": batch.status, "input_file_id": pending["input_file_id"], "docs": docs,
+                                  "output_file_id": batch.output_file_id, "error_file_id": batch.error_file_id,
+                                  "collected": False}
+    for cid in docs: state["docs"][cid].update(status="submitted", batch_id=batch.id)
+    del state["pending"]
+    save_state(work, state)
+    metrics.log_event("batch_submitted", batch_id=batch.id, docs=len(docs))
+    return state
+
+def refresh(work, client):
+    """Один запрос статуса на каждый незавершенный батч, без ожидания"""
+    state = load_state(work)
+    for bid in _open_batches(state):
+        batch = client.batches.retrieve(bid)
+        state["batches"][bid].update(status=batch.status, output_file_id=batch.output_file_id,
+                                     error_file_id=batch.error_file_id)
+    save_state(work, state)
+    return state
+
+def poll(work, client, interval=POLL_INTERVAL, timeout=None):
+    started = time.monotonic()
+    while True:
+        state = refresh(work, client)
+        if not _open_batches(state): return state
+        if timeout is not None and time.monotonic() - started > timeout: return state
+        time.sleep(interval)
+
+# --- 3. РЕЗУЛЬТАТЫ ---
+def parse_result_line(line):
+    """Строка выходного JSONL -> (custom_id, Quiz | None, ошибка | None, model, usage)"""
+    item = json.loads(line)
+    cid = item.get("custom_id")
+    resp = item.get("response") or {}
+    if item.get("error") or resp.get("status_code", 200) != 200:
+        return cid, None, str(item.get("error") or resp.get("body"))[:300], None, None
+    body = resp.get("body") or {}
+    try:
+        data = json.loads(body["choices"][0]["message"]["content"])
+        questions = quality.clean(data.get("questions"))
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        return cid, None, f"bad response: {e}", body.get("model"), body.get("usage")
+    if not questions:
+        return cid, None, "no valid questions", body.get("model"), body.get("usage")
+    return cid, Quiz(questions), None, body.get("model"), body.get("usage")
+
+def collect(work, client):
+    """Скачивает результаты завершенных батчей и пишет <work>/quizzes/<doc_id>.json. Повторный вызов - идемпотентен"""
+    state = load_state(work)
+    quiz_dir = os.path.join(work, "quizzes")
+    os.makedirs(quiz_dir, exist_ok=True)
+    for bid, b in state["batches"].items():
+        if b["status"] not in TERMINAL or b["collected"]: continue
+        results = {}
+        for key in ("output_file_id", "error_file_id"):
+            if b.get(key):
+                for line in client.files.content(b[key]).text.splitlines():
+                    if line.strip():
+                        cid, quiz, error, model, u = parse_result_line(line)
+                        results[cid] = (quiz, error, model, u)
+        for cid in b["docs"]:
+            doc = state["docs"].get(cid)
+            if not doc or doc.get("batch_id") != bid or doc["status"] != "submitted": continue
+            if cid not in results:
+                # expired/cancelled: без ответа - уйдет в следующий батч; failed - ошибка всего батча
+                if b["status"] == "failed": doc.update(status="failed", error="batch failed")
+                else: doc.update(status="queued")
+                continue
+            quiz, error, model, u = results[cid]
+            if u and model:
+                usage.record_llm(model, "quiz_batch", SimpleNamespace(**u), BATCH_PRICE_FACTOR)
+            if quiz:
+                with open(os.path.join(quiz_dir, f"{cid}.json"), "wb") as f: f.write(quiz.to_json())
+                doc.update(status="done", questions=len(quiz.questions))
+            else:
+                doc.update(status="failed", error=error)
+        b["collected"] = True
+        save_state(work, state)
+    return state
+
+def load_quizzes(work):
+    """{путь исходника: Quiz} для всех готовых документов"""
+    state = load_state(work)
+    out = {}
+    for cid, doc in state["docs"].items():
+        if doc["status"] == "done":
+            with open(os.path.join(work, "quizzes", f"{cid}.json"), "rb") as f: out[doc["path"]] = Quiz.from_json(f.read())
+    return out
+
+def summary(state):
+    counts = {}
+    for d in state["docs"].values(): counts[d["status"]] = counts.get(d["status"], 0) + 1
+    batches = " ".join(f"{bid}={b['status']}" for bid, b in state["batches"].items()) or "batches=-"
+    return batches + " " + " ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["run", "build", "submit", "status", "collect"])
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--work", default="batch_work")
+    ap.add_argument("--questions", type=int, default=5)
+    ap.add_argument("--difficulty", default="Medium")
+    ap.add_argument("--language", default="Russian")
+    ap.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    a = ap.parse_args(argv)
+    client = logic.get_client(logic.get_api_key())
+
+    if a.command in ("run", "build"):
+        if a.paths:
+            build_requests(a.work, a.paths, a.questions, a.difficulty, a.language)
+    if a.command in ("run", "submit"):
+        submit(a.work, client)
+    if a.command == "run":
+        poll(a.work, client, a.poll_interval)
+    if a.command == "status":
+        refresh(a.work, client)
+    if a.command in ("run", "collect"):
+        collect(a.work, client)
+    print(summary(load_state(a.work)))
+
+if __name__ == "__main__":
+    sys.exit(main())
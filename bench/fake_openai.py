@@ -0,0 +1,147 @@
+"""Локальная замена OpenAI API для бенчмарков.
+
+Отвечает на /v1/chat/completions и /v1/audio/transcriptions с настраиваемой
+задержкой; /v1/files и /v1/batches - упрощенный Batch API (батч завершается сразу). Запуск отдельно:  python bench/fake_openai.py --port 8765 --latency 0.8
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    latency = 0.5          # секунды на запрос
+    jitter = 0.1           # +- случайная добавка
+    audio_latency_per_mb = 1.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _sleep(self, extra=0.0):
+        time.sleep(max(0.0, self.latency + extra + random.uniform(-self.jitter, self.jitter)))
+
+    def _send(self, status, body, content_type="application/json"):
+        raw = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self):
+        if re.search(r"/batches(\?.*)?$", self.path):
+            data = sorted(_batches.values(), key=lambda b: b["created_at"], reverse=True)
+            return self._send(200, json.dumps({"object": "list", "data": data, "has_more": False,
+                                               "first_id": data[0]["id"] if data else None,
+                                               "last_id": data[-1]["id"] if data else None}))
+        m = re.search(r"/batches/([\w-]+)$", self.path)
+        if m and m.group(1) in _batches:
+            return self._send(200, json.dumps(_batches[m.group(1)]))
+        m = re.search(r"/files/([\w-]+)/content$", self.path)
+        if m and m.group(1) in _files:
+            return self._send(200, _files[m.group(1)], "application/octet-stream")
+        self._send(404, json.dumps({"error": {"message": f"unknown path {self.path}"}}))
+
+    def do_POST(self):
+        body = self._body()
+        if self.path.endswith("/chat/completions"):
+            self._sleep()
+            return self._send(200, json.dumps(chat_response(json.loads(body))))
+        if self.path.endswith("/audio/transcriptions"):
+            self._sleep(self.audio_latency_per_mb * len(body) / (1024 * 1024))
+            text = "Это тестовая расшифровка аудио. " * 40
+            if b'name="response_format"\r\n\r\ntext' in body:
+                return self._send(200, text, "text/plain; charset=utf-8")
+            return self._send(200, json.dumps({"text": text}))
+        if self.path.endswith("/files"):
+            return self._send(200, json.dumps(store_file(multipart_file(body, self.headers["Content-Type"]))))
+        if self.path.endswith("/batches"):
+            return self._send(200, json.dumps(run_batch(json.loads(body))))
+        self._send(404, json.dumps({"error": {"message": f"unknown path {self.path}"}}))
+
+def fake_quiz(num_questions):
+    return {"questions": [{
+        "scenario": f"Вопрос {i + 1}: что описано в разделе {i + 1}?",
+        "options": [f"Вариант {i + 1}.{j + 1}" for j in range(4)],
+        "correct_option_id": i % 4,
+        "explanation": "Так написано в тексте.",
+    } for i in range(num_questions)]}
+
+def chat_response(req):
+    prompt = "".join(m.get("content", "") for m in req.get("messages", []) if isinstance(m.get("content"), str))
+    m = re.search(r"Number of questions:\s*(\d+)", prompt)
+    if req.get("response_format", {}).get("type") == "json_object":
+        content = json.dumps(fake_quiz(int(m.group(1)) if m else 5), ensure_ascii=False)
+    else:
+        content = "1. Повторяйте материал.\n2. Решайте задачи.\n3. Объясняйте другим."
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+        "model": req.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+# --- BATCH API ---
+_files, _batches = {}, {}
+
+def multipart_file(body, content_type):
+    boundary = content_type.split("boundary=")[-1].strip('"').encode()
+    for part in body.split(b"--" + boundary):
+        head, _, data = part.partition(b"\r\n\r\n")
+        if b'name="file"' in head: return data[:-2] if data.endswith(b"\r\n") else data
+    return b""
+
+def store_file(data):
+    file_id = f"file-{uuid.uuid4().hex[:12]}"
+    _files[file_id] = data
+    return {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()), "purpose": "batch"}
+
+def run_batch(req):
+    out = []
+    for line in _files[req["input_file_id"]].decode("utf-8").splitlines():
+        if not line.strip(): continue
+        item = json.loads(line)
+        out.append(json.dumps({"id": f"batch_req_{uuid.uuid4().hex[:8]}", "custom_id": item["custom_id"],
+                               "response": {"status_code": 200, "body": chat_response(item["body"])}, "error": None},
+                              ensure_ascii=False))
+    output = store_file("\n".join(out).encode("utf-8"))
+    batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+    _batches[batch_id] = {
+        "id": batch_id, "object": "batch", "endpoint": req["endpoint"], "input_file_id": req["input_file_id"],
+        "completion_window": req["completion_window"], "status": "completed", "created_at": int(time.time()),
+        "output_file_id": output["id"], "error_file_id": None,
+        "request_counts": {"total": len(out), "completed": len(out), "failed": 0}}
+    return _batches[batch_id]
+
+def start_server(port=0, latency=0.5, jitter=0.1, audio_latency_per_mb=1.0):
+    """Поднимает сервер в фоновом потоке, возвращает (server, base_url)"""
+    handler = type("Handler", (FakeOpenAI,), {
+        "latency": latency, "jitter": jitter, "audio_latency_per_mb": audio_latency_per_mb})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.5)
+    ap.add_argument("--jitter", type=float, default=0.1)
+    ap.add_argument("--audio-latency-per-mb", type=float, default=1.0)
+    a = ap.parse_args()
+    server, url = start_server(a.port, a.latency, a.jitter, a.audio_latency_per_mb)
+    print(f"Fake OpenAI: {url}  (OPENAI_BASE_URL={url})")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
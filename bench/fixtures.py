@@ -0,0 +1,76 @@
+"""Генерация фикстур для бенчмарков: PDF, DOCX и WAV нескольких размеров."""
+import math
+import os
+import struct
+import wave
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Размер: (страниц PDF / абзацев DOCX, секунд аудио)
+SIZES = {"small": (2, 15), "medium": (20, 120), "large": (100, 600)}
+
+PARAGRAPH = ("Охрана труда включает систему мероприятий, направленных на сохранение жизни и здоровья "
+             "работников в процессе трудовой деятельности. Работодатель обязан проводить инструктажи, "
+             "обеспечивать средствами индивидуальной защиты и контролировать соблюдение требований. ")
+
+def make_pdf(path, pages):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    c = canvas.Canvas(path, pagesize=A4)
+    font = "Helvetica"
+    ttf = os.path.join(os.path.dirname(os.path.dirname(__file__)), "DejaVuSans.ttf")
+    if os.path.exists(ttf):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        pdfmetrics.registerFont(TTFont("DejaVuSans", ttf))
+        font = "DejaVuSans"
+    for p in range(pages):
+        c.setFont(font, 9)
+        c.drawString(40, 810, "Учебный курс VYUD — Охрана труда")
+        y = 780
+        for i in range(40):
+            c.drawString(40, y, (PARAGRAPH * 2)[i * 7:i * 7 + 95])
+            y -= 18
+        c.drawString(290, 20, str(p + 1))
+        c.showPage()
+    c.save()
+
+def make_docx(path, paragraphs):
+    from docx import Document
+    doc = Document()
+    doc.add_heading("Учебный курс VYUD", 0)
+    for i in range(paragraphs * 5):
+        doc.add_paragraph(f"{i + 1}. " + PARAGRAPH)
+    doc.save(path)
+
+def make_wav(path, seconds, rate=16000):
+    # Тон 440 Гц с паузами: 3 c звука, 1 c тишины
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        frames = bytearray()
+        for n in range(int(seconds * rate)):
+            t = n / rate
+            v = int(8000 * math.sin(2 * math.pi * 440 * t)) if (t % 4) < 3 else 0
+            frames += struct.pack("<h", v)
+        w.writeframes(bytes(frames))
+
+def build(kinds=("pdf", "docx", "wav"), sizes=tuple(SIZES)):
+    """Создает недостающие фикстуры, возвращает {(kind, size): path}"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    out = {}
+    for size in sizes:
+        pages, seconds = SIZES[size]
+        for kind in kinds:
+            path = os.path.join(FIXTURE_DIR, f"{size}.{kind}")
+            if not os.path.exists(path):
+                {"pdf": lambda: make_pdf(path, pages),
+                 "docx": lambda: make_docx(path, pages),
+                 "wav": lambda: make_wav(path, seconds)}[kind]()
+            out[(kind, size)] = path
+    return out
+
+if __name__ == "__main__":
+    for key, path in build().items():
+        print(key, path, f"{os.path.getsize(path) / 1024:.0f} KB")
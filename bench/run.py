@@ -0,0 +1,200 @@
+"""Сквозной бенчмарк конвейера: извлечение -> генерация -> сертификат + нагрузка бота.
+
+    python bench/run.py                       # все стадии, результат в bench/results/<commit>.json
+    python bench/run.py --stages extract --sizes small medium
+    python bench/run.py --compare <commit>    # сравнить с сохраненным прогоном
+
+OpenAI подменяется локальным bench/fake_openai.py (задержка --latency).
+Каждая стадия идет в отдельном процессе, поэтому peak RSS считается по стадии.
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing as mp
+import os
+import queue as queue_mod
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures
+from fake_openai import start_server
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = ("extract", "generate", "certificate", "bot")
+STAGE_TIMEOUT = 1800       # стадия дольше - считаем зависшей
+
+# --- СТАТИСТИКА ---
+def percentile(values, p):
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+def summarize(latencies, wall, peak_rss_kb):
+    return {
+        "n": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "throughput_per_s": round(len(latencies) / wall, 2) if wall else 0.0,
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+    }
+
+# --- СТАДИИ (выполняются в дочернем процессе) ---
+def stage_extract(paths, iterations):
+    import logic
+    latencies = []
+    for path in paths:
+        for _ in range(iterations):
+            t = time.perf_counter()
+            logic.extract_text_from_path(path)
+            latencies.append(time.perf_counter() - t)
+    return latencies
+
+def stage_generate(paths, iterations):
+    import logic
+    text = fixtures.PARAGRAPH * 200
+    latencies = []
+    for _ in range(iterations * max(1, len(paths))):
+        t = time.perf_counter()
+        logic.generate_quiz_ai(text, 5, "Medium", "Russian")
+        latencies.append(time.perf_counter() - t)
+    return latencies
+
+def stage_certificate(paths, iterations):
+    import logic
+    latencies = []
+    for _ in range(iterations * max(1, len(paths))):
+        t = time.perf_counter()
+        logic.create_certificate("Иван Иванов", "Охрана труда")
+        latencies.append(time.perf_counter() - t)
+    return latencies
+
+def stage_bot(paths, iterations, concurrency):
+    # Синтетическая нагрузка бота: concurrency одновременных пользователей, каждый шлет iterations
+    # файлов подряд (как в bot.run_pipeline) - всего concurrency * iterations задач на файл
+    import logic
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(path):
+        async with slots:
+            t = time.perf_counter()
+            text = await asyncio.to_thread(logic.extract_text_from_path, path)
+            await asyncio.to_thread(logic.generate_quiz_ai, text, 5, "medium", "ru")
+            latencies.append(time.perf_counter() - t)
+
+    async def run():
+        await asyncio.gather(*[one(p) for p in paths for _ in range(concurrency * iterations)])
+
+    asyncio.run(run())
+    return latencies
+
+def _child(stage, paths, iterations, concurrency, queue):
+    # Родитель ждет ровно один результат: ошибка стадии тоже отправляется, иначе он зависнет
+    try:
+        fn = globals()[f"stage_{stage}"]
+        t = time.perf_counter()
+        latencies = fn(paths, iterations, concurrency) if stage == "bot" else fn(paths, iterations)
+        wall = time.perf_counter() - t
+        queue.put(summarize(latencies, wall, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    except BaseException as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"[:500]})
+        raise
+
+def run_stage(stage, paths, iterations, concurrency):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(stage, paths, iterations, concurrency, queue))
+    proc.start()
+    deadline = time.monotonic() + STAGE_TIMEOUT
+    while True:
+        try:
+            result = queue.get(timeout=1.0)
+            break
+        except queue_mod.Empty:
+            if not proc.is_alive():
+                # Процесс умер, не отправив результат (сигнал, OOM)
+                try: result = queue.get(timeout=1.0)
+                except queue_mod.Empty: result = {"error": f"stage process exited with code {proc.exitcode}"}
+                break
+            if time.monotonic() > deadline:
+                proc.kill()
+                result = {"error": f"no result in {STAGE_TIMEOUT}s"}
+                break
+    proc.join(timeout=10)
+    return result
+
+# --- РЕЗУЛЬТАТЫ ---
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def save_results(result):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    with open(path, "w") as f: json.dump(result, f, ensure_ascii=False, indent=2)
+    return path
+
+def load_results(ref):
+    for name in sorted(os.listdir(RESULTS_DIR)):
+        if name.startswith(ref):
+            with open(os.path.join(RESULTS_DIR, name)) as f: return json.load(f)
+    raise SystemExit(f"Нет сохраненного прогона для {ref}")
+
+def print_table(result, baseline=None):
+    print(f"commit {result['commit']}  latency={result['config']['latency']}s")
+    print(f"{'stage':<22}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>8}{'RSS MB':>8}")
+    for name, s in result["stages"].items():
+        if "error" in s:
+            print(f"{name:<22}ERROR {s['error']}")
+            continue
+        line = f"{name:<22}{s['n']:>5}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['throughput_per_s']:>8}{s['peak_rss_mb']:>8}"
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base and base.get("p50_ms"):
+            line += f"   p50 {100 * (s['p50_ms'] / base['p50_ms'] - 1):+.0f}%"
+            if base.get("p95_ms"): line += f"  p95 {100 * (s['p95_ms'] / base['p95_ms'] - 1):+.0f}%"
+        print(line)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    ap.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(fixtures.SIZES))
+    ap.add_argument("--kinds", nargs="+", default=["pdf", "docx", "wav"], choices=["pdf", "docx", "wav"])
+    ap.add_argument("--iterations", type=int, default=3)
+    ap.add_argument("--concurrency", type=int, default=6, help="одновременных пользователей в нагрузке бота (только стадия bot)")
+    ap.add_argument("--latency", type=float, default=0.3, help="задержка фейкового OpenAI, с")
+    ap.add_argument("--compare", help="commit сохраненного прогона для сравнения")
+    ap.add_argument("--no-save", action="store_true")
+    a = ap.parse_args()
+
+    paths = fixtures.build(a.kinds, a.sizes)
+    server, base_url = start_server(latency=a.latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+    result = {"commit": current_commit(), "timestamp": time.time(),
+              "config": {"latency": a.latency, "iterations": a.iterations, "concurrency": a.concurrency,
+                         "sizes": a.sizes, "kinds": a.kinds},
+              "stages": {}}
+    for stage in a.stages:
+        if stage in ("extract", "bot"):
+            for (kind, size), path in sorted(paths.items()):
+                result["stages"][f"{stage}:{kind}:{size}"] = run_stage(stage, [path], a.iterations, a.concurrency)
+        else:
+            result["stages"][stage] = run_stage(stage, list(paths.values())[:1], a.iterations, a.concurrency)
+    server.shutdown()
+
+    print_table(result, load_results(a.compare) if a.compare else None)
+    if not a.no_save:
+        print("saved:", save_results(result))
+
+if __name__ == "__main__":
+    main()
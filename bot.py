@@ -1,24 +1,30 @@
 import asyncio
+import html
 import logging
 import os
 import toml
+import time
 from pathlib import Path
 from aiogram import Bot, Dispatcher, Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, BotCommand, BotCommandScopeDefault
+import metrics
+import scratch
+import usage
 
 # --- ИМПОРТ ЛОГИКИ ---
 try:
-    from logic import transcribe_for_bot as transcribe_audio, generate_quiz_ai as generate_quiz_struct
+    from logic import extract_text_from_path as extract_text, generate_quiz_ai as generate_quiz_struct, GenerationError
     # [FIX] ВАЖНО: deduct_credit (без 's' на конце!)
     from auth import get_user_credits as get_credits, deduct_credit 
 except ImportError as e:
     logging.error(f"CRITICAL IMPORT ERROR: {e}")
     # Заглушки на случай аварии
-    def transcribe_audio(path): return "Error"
+    def extract_text(path): return "Error"
+    class GenerationError(Exception): pass
     def generate_quiz_struct(text): return None
     def get_credits(email): return 99
-    def deduct_credit(email, n): pass
+    def deduct_credit(email, amount=1, job_id=None): pass
 
 # --- КОНФИГУРАЦИЯ ---
 secrets_path = Path(__file__).parent / ".streamlit" / "secrets.toml"
@@ -49,7 +55,7 @@ async def cmd_start(message: Message):
     credits = get_credits(f"{message.from_user.username}@telegram.io")
     await message.answer(
         f"👋 <b>Привет! Я VYUD AI.</b>\n\n"
-        f"Кидай мне кружочек — я сделаю из него <b>интерактивную викторину!</b>\n"
+        f"Кидай мне кружочек, голосовое, видео или документ (PDF/DOCX) — я сделаю из него <b>интерактивную викторину!</b>\n"
         f"⚡️ Баланс: {credits}", parse_mode="HTML"
     )
 
@@ -58,80 +64,163 @@ async def cmd_profile(message: Message):
     credits = get_credits(f"{message.from_user.username}@telegram.io")
     await message.answer(f"👤 @{message.from_user.username}\n⚡️ {credits} кредитов")
 
-@router.message(F.video_note)
-async def handle_video_note(message: Message):
+# --- ЛИМИТЫ ПО ТИПАМ МЕДИА ---
+# max_mb: лимит Bot API на скачивание - 20 MB
+# max_duration: секунды (для документов не проверяется)
+# concurrency: сколько задач этого типа обрабатываем одновременно
+MEDIA_LIMITS = {
+    "video_note": {"max_mb": 20, "max_duration": 60, "concurrency": 4, "ext": "mp4", "label": "кружочек"},
+    "voice": {"max_mb": 20, "max_duration": 1200, "concurrency": 4, "ext": "ogg", "label": "голосовое"},
+    "audio": {"max_mb": 20, "max_duration": 1200, "concurrency": 2, "ext": "mp3", "label": "аудио"},
+    "video": {"max_mb": 20, "max_duration": 1200, "concurrency": 2, "ext": "mp4", "label": "видео"},
+    "document": {"max_mb": 20, "max_duration": None, "concurrency": 3, "ext": None, "label": "документ"},
+}
+DOCUMENT_EXTENSIONS = ("pdf", "docx", "txt", "mp3", "m4a", "wav", "ogg", "mp4", "mov", "webm")
+MAX_CONCURRENT_JOBS = int(os.getenv("BOT_MAX_JOBS", "6"))
+
+_job_slots = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+_type_slots = {kind: asyncio.Semaphore(cfg["concurrency"]) for kind, cfg in MEDIA_LIMITS.items()}
+
+def detect_media(message: Message):
+    """Возвращает (тип, объект медиа, расширение) или (None, None, None)"""
+    for kind in ("video_note", "voice", "audio", "video", "document"):
+        media = getattr(message, kind, None)
+        if not media:
+            continue
+        ext = MEDIA_LIMITS[kind]["ext"]
+        file_name = getattr(media, "file_name", None)
+        if file_name and "." in file_name:
+            ext = file_name.rsplit(".", 1)[-1].lower()
+        return kind, media, ext
+    return None, None, None
+
+def check_limits(kind, media, ext):
+    """Текст ошибки, если файл не проходит лимиты типа, иначе None"""
+    cfg = MEDIA_LIMITS[kind]
+    if kind == "document" and ext not in DOCUMENT_EXTENSIONS:
+        return f"📎 Формат .{ext} не поддерживается. Подходят: {', '.join(DOCUMENT_EXTENSIONS)}"
+    size = getattr(media, "file_size", None) or 0
+    if size > cfg["max_mb"] * 1024 * 1024:
+        return f"🐘 Файл слишком большой ({size / (1024*1024):.1f} MB). Лимит: {cfg['max_mb']} MB."
+    duration = getattr(media, "duration", None)
+    if cfg["max_duration"] and duration and duration > cfg["max_duration"]:
+        return f"⏱ Слишком длинно ({duration}с). Лимит: {cfg['max_duration']}с."
+    return None
+
+@router.message(F.video_note | F.voice | F.audio | F.video | F.document)
+async def handle_media(message: Message):
+    kind, media, ext = detect_media(message)
+    if not kind:
+        return
     user_email = f"{message.from_user.username}@telegram.io"
-    
+
     # Проверка баланса
     if get_credits(user_email) <= 0:
         await message.answer("🚫 Кредиты закончились! Пополните баланс.")
         return
 
-    status_msg = await message.answer("📥 Скачиваю кружочек...")
-    file_id = message.video_note.file_id
-    file_path = f"temp_{message.from_user.id}_{file_id}.mp4"
+    error = check_limits(kind, media, ext)
+    if error:
+        await message.answer(error)
+        return
+
+    label = MEDIA_LIMITS[kind]["label"]
+    status_msg = await message.answer(f"⏳ {label.capitalize()} в очереди...")
+    queued_at = time.perf_counter()
+    # Сначала слот своего типа, потом общий: видео в очереди за видео не держит общий слот
+    # и не блокирует документы
+    async with _type_slots[kind], _job_slots:
+        metrics.observe("vyud_bot_queue_wait_seconds", time.perf_counter() - queued_at, kind=kind)
+        metrics.inc("vyud_bot_jobs_total", kind=kind)
+        try:
+            # Файл - в каталоге задачи в scratch (не в cwd), каталог удаляется при любом исходе
+            with metrics.span("bot_job", kind=kind), usage.job(f"{message.from_user.username}@telegram.io") as job_id, \
+                    scratch.job("bot", reserve=getattr(media, "file_size", None) or 0) as sd:
+                await run_pipeline(message, status_msg, kind, media, ext, sd.path(f"input.{ext}"), job_id)
+        except scratch.ScratchQuotaError as e:
+            logging.warning(f"Scratch full ({kind}): {e}")
+            await message.answer("⏳ Сервер сейчас перегружен. Попробуйте через пару минут.")
+
+async def run_pipeline(message: Message, status_msg, kind, media, ext, file_path, job_id=None):
+    """Скачивание -> извлечение -> генерация -> доставка"""
+    label = MEDIA_LIMITS[kind]["label"]
+    file_id = media.file_id
+    user_email = f"{message.from_user.username}@telegram.io"
 
     try:
         # 1. Скачивание
-        file_info = await bot.get_file(file_id)
-        await bot.download_file(file_info.file_path, file_path)
-        
-        # 2. Транскрибация
-        await bot.edit_message_text("👂 Слушаю (Whisper)...", chat_id=message.chat.id, message_id=status_msg.message_id)
-        transcript = await asyncio.to_thread(transcribe_audio, file_path)
-        
-        if not transcript or "Error" in transcript:
-            await message.answer("❌ Не слышу речи или файл поврежден.")
+        await bot.edit_message_text(f"📥 Скачиваю {label}...", chat_id=message.chat.id, message_id=status_msg.message_id)
+        with metrics.span("bot_download", kind=kind):
+            file_info = await bot.get_file(file_id)
+            await bot.download_file(file_info.file_path, file_path)
+
+        # 2. Извлечение текста
+        stage = "📖 Читаю документ..." if kind == "document" and ext in ("pdf", "docx", "txt") else "👂 Слушаю (Whisper)..."
+        await bot.edit_message_text(stage, chat_id=message.chat.id, message_id=status_msg.message_id)
+        with metrics.span("bot_extract", kind=kind):
+            transcript = await asyncio.to_thread(extract_text, file_path)
+
+        if not transcript or not transcript.strip() or transcript.startswith("Error"):
+            await message.answer("❌ Не удалось извлечь текст: нет речи или файл поврежден.")
             return
 
         # 3. Генерация
         await bot.edit_message_text("🧠 Генерирую викторину...", chat_id=message.chat.id, message_id=status_msg.message_id)
-        quiz_data = await asyncio.to_thread(generate_quiz_struct, transcript, 5, "medium", "ru")
-        
+        try:
+            with metrics.span("bot_generate", kind=kind):
+                quiz_data = await asyncio.to_thread(generate_quiz_struct, transcript, 5, "medium", "ru")
+        except GenerationError as e:
+            logging.warning(f"Generation failed ({kind}): {e}")
+            quiz_data = None
+
         if not quiz_data or not quiz_data.questions:
-            await message.answer("❌ Не удалось придумать вопросы по этому тексту.")
+            await message.answer("❌ Не удалось придумать вопросы по этому тексту. Кредит не списан.")
             return
 
         # 4. Списание и Ответ
-        deduct_credit(user_email, 1) # [FIX] И тут без 's'
-        
+        deduct_credit(user_email, job_id=job_id) # [FIX] И тут без 's'; цена - по расходам задачи
+
         await bot.delete_message(chat_id=message.chat.id, message_id=status_msg.message_id)
-        
-        preview_text = transcript[:200] + "..." if len(transcript) > 200 else transcript
+
+        flat = " ".join(transcript.split())
+        preview_text = flat[:200] + "..." if len(flat) > 200 else flat
         await message.answer(
             f"✅ <b>Готово!</b>\n\n"
-            f"🗣 <i>\"{preview_text}\"</i>\n\n"
+            f"🗣 <i>\"{html.escape(preview_text)}\"</i>\n\n"
             f"👇 <b>А теперь проверь себя!</b>",
             parse_mode="HTML"
         )
-        
+
         # 5. Опросы
-        for q in quiz_data.questions:
-            try:
-                await bot.send_poll(
-                    chat_id=message.chat.id,
-                    question=q.scenario[:299],
-                    options=[opt[:99] for opt in q.options],
-                    type='quiz',
-                    correct_option_id=q.correct_option_id,
-                    explanation=q.explanation[:199],
-                    is_anonymous=False
-                )
-                await asyncio.sleep(0.5) 
-            except Exception as e:
-                logging.error(f"Poll Error: {e}")
+        with metrics.span("bot_deliver", kind=kind):
+            await deliver_quiz(message.chat.id, quiz_data)
 
     except Exception as e:
-        logging.error(f"Global Error: {e}")
+        metrics.inc("vyud_bot_errors_total", stage="pipeline", kind=kind)
+        logging.error(f"Global Error ({kind}): {e}")
         await message.answer("❌ Произошла ошибка.")
-    
-    finally:
-        if os.path.exists(file_path): 
-            try: os.remove(file_path)
-            except: pass
+
+async def deliver_quiz(chat_id, quiz_data):
+    for q in quiz_data.questions:
+        try:
+            await bot.send_poll(
+                chat_id=chat_id,
+                question=q.scenario[:299],
+                options=[opt[:99] for opt in q.options],
+                type='quiz',
+                correct_option_id=q.correct_option_id,
+                explanation=q.explanation[:199],
+                is_anonymous=False
+            )
+            await asyncio.sleep(0.5)
+        except Exception as e:
+            metrics.inc("vyud_bot_errors_total", stage="poll")
+            logging.error(f"Poll Error: {e}")
 
 async def main():
     logging.basicConfig(level=logging.INFO)
+    metrics.serve()
+    scratch.sweep()  # хвосты от прошлых запусков
     dp = Dispatcher()
     dp.include_router(router)
     await set_main_menu(bot)
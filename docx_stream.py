@@ -0,0 +1,79 @@
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import metrics
+import textprep
+
+# --- ПОТОКОВОЕ ЧТЕНИЕ DOCX ---
+# word/document.xml читается iterparse'ом в порядке документа: абзацы и строки таблиц
+# ("ячейка | ячейка"), обработанные элементы сразу выбрасываются - память не растет с размером файла.
+# Колонтитулы (header*/footer*.xml) добавляются один раз в конце. Чтение останавливается,
+# как только набран max_tokens. Объектная модель python-docx не строится.
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+P, TBL, TR, TC = W + "p", W + "tbl", W + "tr", W + "tc"
+T, TAB, BR, CR = W + "t", W + "tab", W + "br", W + "cr"
+_PARTS = re.compile(r"word/(header|footer)\d*\.xml$")
+
+def _paragraph_text(p):
+    out = []
+    for el in p.iter():
+        if el.tag == T: out.append(el.text or "")
+        elif el.tag == TAB: out.append("\t")
+        elif el.tag in (BR, CR): out.append("\n")
+    return "".join(out).strip()
+
+def iter_part(f):
+    """Строки одной XML-части: абзацы и строки таблиц по порядку"""
+    stack, tables = [], []
+    for event, el in ET.iterparse(f, events=("start", "end")):
+        if event == "start":
+            stack.append(el)
+            if el.tag == TBL: tables.append({"row": [], "cell": []})
+            continue
+        stack.pop()
+        tag = el.tag
+        if tag == P:
+            text = _paragraph_text(el)
+            if tables: tables[-1]["cell"].append(text)
+            elif text: yield text
+        elif tag == TC and tables:
+            t = tables[-1]
+            t["row"].append(" ".join(x for x in t["cell"] if x))
+            t["cell"] = []
+        elif tag == TR and tables:
+            t = tables[-1]
+            line = " | ".join(c for c in t["row"] if c)
+            t["row"] = []
+            if len(tables) > 1: tables[-2]["cell"].append(line)   # вложенная таблица - текст ячейки
+            elif line: yield line
+        elif tag == TBL and tables:
+            tables.pop()
+        else:
+            continue
+        # Обработанный блок больше не нужен
+        el.clear()
+        if stack: stack[-1].remove(el)
+
+def iter_blocks(source):
+    """source - путь или файловый объект .docx"""
+    with zipfile.ZipFile(source) as z:
+        with z.open("word/document.xml") as f:
+            yield from iter_part(f)
+        seen = set()
+        for name in sorted(n for n in z.namelist() if _PARTS.match(n)):
+            with z.open(name) as f:
+                for line in iter_part(f):
+                    if line not in seen:
+                        seen.add(line)
+                        yield line
+
+def read_text(source, max_tokens=None):
+    lines, used = [], 0
+    for line in iter_blocks(source):
+        lines.append(line)
+        if max_tokens:
+            used += textprep.count_tokens(line)
+            if used >= max_tokens:
+                metrics.inc("vyud_extract_truncated_total", kind="docx")
+                break
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+import os
+import hashlib
+import sqlite3
+import numpy as np
+import metrics
+import resilience
+import usage
+
+# --- ЭМБЕДДИНГИ ---
+# Бэкенды: "openai" (API) или "local" (CPU, без сети: fastembed/ONNX или sentence-transformers).
+# "auto" - локальный, если он установлен, иначе OpenAI.
+# Все векторы кэшируются на диске по хэшу (модель + текст) - повторные чанки не считаются заново.
+EMBED_BACKEND = os.environ.get("VYUD_EMBED_BACKEND", "auto")
+EMBED_MODEL = "text-embedding-3-small"
+LOCAL_MODEL = os.environ.get("VYUD_LOCAL_EMBED_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+LOCAL_THREADS = int(os.environ.get("VYUD_EMBED_THREADS", str(os.cpu_count() or 1)))
+BATCH_SIZE = 128
+EMBED_TIMEOUT = 30                 # на один запрос к API; повторы и breaker - через resilience
+EMBED_DEADLINE = 60                # на все батчи документа
+CACHE_DB = os.environ.get("VYUD_EMBED_CACHE", "embeddings_cache.db")
+
+try:
+    from fastembed import TextEmbedding
+except ImportError:
+    TextEmbedding = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+_local_model = None
+_cache_ready = False
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def local_available():
+    return TextEmbedding is not None or SentenceTransformer is not None
+
+def backend():
+    if EMBED_BACKEND == "auto":
+        return "local" if local_available() else "openai"
+    return EMBED_BACKEND
+
+def model_id():
+    """Имя модели текущего бэкенда - входит в ключи кэша и индексов"""
+    return LOCAL_MODEL if backend() == "local" else EMBED_MODEL
+
+# --- БЭКЕНДЫ ---
+def _embed_openai(texts):
+    from logic import get_api_key, get_client
+    client = get_client(get_api_key(), EMBED_TIMEOUT)
+    deadline = resilience.Deadline(EMBED_DEADLINE)
+    out = []
+    for i in range(0, len(texts), BATCH_SIZE):
+        batch = texts[i:i + BATCH_SIZE]
+        with metrics.span("embed", backend="openai", model=EMBED_MODEL):
+            res = resilience.call(
+                lambda timeout: client.embeddings.create(model=EMBED_MODEL, input=batch, timeout=timeout),
+                "openai", deadline=deadline, timeout=EMBED_TIMEOUT)
+        usage.record_llm(EMBED_MODEL, "embed", res.usage)
+        out.extend(d.embedding for d in res.data)
+    return np.asarray(out, dtype=np.float32)
+
+def _get_local_model():
+    global _local_model
+    if _local_model is None:
+        if TextEmbedding is not None:
+            _local_model = TextEmbedding(model_name=LOCAL_MODEL, threads=LOCAL_THREADS)
+        elif SentenceTransformer is not None:
+            import torch
+            torch.set_num_threads(LOCAL_THREADS)
+            _local_model = SentenceTransformer(LOCAL_MODEL, device="cpu")
+        else:
+            raise RuntimeError("Локальный эмбеддинг недоступен: pip install fastembed")
+    return _local_model
+
+def _embed_local(texts):
+    model = _get_local_model()
+    with metrics.span("embed", backend="local", model=LOCAL_MODEL) as sp:
+        sp["n"] = len(texts)
+        if TextEmbedding is not None and isinstance(model, TextEmbedding):
+            vectors = np.stack(list(model.embed(texts, batch_size=BATCH_SIZE)))
+        else:
+            vectors = model.encode(texts, batch_size=BATCH_SIZE, convert_to_numpy=True)
+    return vectors.astype(np.float32)
+
+# --- КЭШ ---
+def _cache_conn():
+    global _cache_ready
+    conn = sqlite3.connect(CACHE_DB)
+    if not _cache_ready:
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, vec BLOB)")
+        conn.commit()
+        _cache_ready = True
+    return conn
+
+def chunk_key(model, text):
+    return hashlib.sha1((model + "\0" + text).encode("utf-8")).hexdigest()
+
+def _cache_get(keys):
+    found = {}
+    conn = _cache_conn()
+    for i in range(0, len(keys), 500):
+        part = keys[i:i + 500]
+        rows = conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part)
+        for key, blob in rows:
+            found[key] = np.frombuffer(blob, dtype=np.float32)
+    conn.close()
+    return found
+
+def _cache_put(items):
+    conn = _cache_conn()
+    conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                     [(k, len(v), v.astype(np.float32).tobytes()) for k, v in items])
+    conn.commit()
+    conn.close()
+
+def embed(texts):
+    """Матрица (len(texts), dim) float32, строки нормированы - косинус = скалярное произведение"""
+    if not texts: return np.zeros((0, 0), dtype=np.float32)
+    name = model_id()
+    keys = [chunk_key(name, t) for t in texts]
+    try:
+        cached = _cache_get(list(set(keys)))
+    except sqlite3.Error:
+        cached = {}
+    missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in cached))
+    metrics.inc("vyud_cache_requests_total", len(texts) - len(missing), cache="embeddings", result="hit")
+    metrics.inc("vyud_cache_requests_total", len(missing), cache="embeddings", result="miss")
+    if missing:
+        vectors = _embed_local(missing) if backend() == "local" else _embed_openai(missing)
+        fresh = [(chunk_key(name, t), v) for t, v in zip(missing, vectors)]
+        cached.update(fresh)
+        try:
+            _cache_put(fresh)
+        except sqlite3.Error as e:
+            metrics.log_event("embed_cache_error", error=str(e))
+    return _normalize(np.stack([cached[k] for k in keys]))
@@ -0,0 +1,157 @@
+import io
+import json
+import re
+import zipfile
+import hashlib
+from functools import lru_cache
+from html import escape
+import metrics
+
+# --- ШАБЛОН ---
+# Шаблон один на все экспорты: минифицируется один раз при импорте,
+# данные подставляются через {{TITLE}} / {{DATA}} / {{SCORM}}.
+# Текст вопросов выводится только через textContent - никакого innerHTML.
+PASS_RATIO = 0.7
+
+_TEMPLATE_SRC = """
+<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>{{TITLE}}</title>
+  <style>
+    body{font-family:sans-serif;padding:20px;max-width:800px;margin:0 auto}
+    .card{border:1px solid #ccc;padding:15px;margin-bottom:15px;border-radius:8px}
+    .card label{display:block;margin:4px 0}
+    .btn{background:#007bff;color:white;padding:10px 20px;border:none;cursor:pointer}
+    .correct{color:green;font-weight:bold}
+    .wrong{color:red;font-weight:bold}
+  </style>
+</head>
+<body>
+  <h1>Test: {{TITLE}}</h1>
+  <div id="q"></div>
+  <button class="btn" id="check">Check</button>
+  <h2 id="sc"></h2>
+  <script>
+    const d={{DATA}};
+    const SCORM={{SCORM}};
+    const PASS={{PASS}};
+    function el(tag,cls,text){const e=document.createElement(tag);if(cls)e.className=cls;if(text!==undefined)e.textContent=text;return e;}
+    function render(){
+      const root=document.getElementById('q');
+      d.forEach((q,i)=>{
+        const card=el('div','card');
+        card.appendChild(el('h3',null,(i+1)+'. '+q.question));
+        q.options.forEach((o,j)=>{
+          const label=el('label');
+          const input=document.createElement('input');
+          input.type='radio';input.name='q'+i;input.value=j;
+          label.appendChild(input);
+          label.appendChild(document.createTextNode(' '+o));
+          card.appendChild(label);
+        });
+        const r=el('div');r.id='r'+i;card.appendChild(r);
+        root.appendChild(card);
+      });
+    }
+    function findApi(w){let n=0;while(w&&!w.API&&w.parent&&w.parent!==w&&n<10){w=w.parent;n++;}return w?w.API:null;}
+    const api=SCORM?(findApi(window)||(window.opener&&findApi(window.opener))):null;
+    if(api){api.LMSInitialize('');}
+    function check(){
+      let s=0;
+      d.forEach((q,i)=>{
+        const picked=document.querySelector('input[name="q'+i+'"]:checked');
+        const r=document.getElementById('r'+i);
+        r.textContent='';
+        if(picked&&parseInt(picked.value)===q.correct){s++;r.appendChild(el('span','correct','OK'));}
+        else{r.appendChild(el('span','wrong','Wrong. Answer: '+q.options[q.correct]));}
+      });
+      document.getElementById('sc').textContent='Score: '+s+'/'+d.length;
+      if(api){
+        const pct=d.length?Math.round(100*s/d.length):0;
+        api.LMSSetValue('cmi.core.score.min','0');
+        api.LMSSetValue('cmi.core.score.max','100');
+        api.LMSSetValue('cmi.core.score.raw',String(pct));
+        api.LMSSetValue('cmi.core.lesson_status',s>=d.length*PASS?'passed':'failed');
+        api.LMSCommit('');
+      }
+    }
+    document.getElementById('check').addEventListener('click',check);
+    window.addEventListener('unload',()=>{if(api){api.LMSFinish('');}});
+    render();
+  </script>
+</body>
+</html>
+"""
+
+_MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<manifest identifier="{ident}" version="1.0"
+  xmlns="http://www.imsproject.org/xsd/imscp_rootv1p1p2"
+  xmlns:adlcp="http://www.adlnet.org/xsd/adlcp_rootv1p2">
+  <metadata><schema>ADL SCORM</schema><schemaversion>1.2</schemaversion></metadata>
+  <organizations default="ORG-1">
+    <organization identifier="ORG-1">
+      <title>{title}</title>
+      <item identifier="ITEM-1" identifierref="RES-1"><title>{title}</title><adlcp:masteryscore>{mastery}</adlcp:masteryscore></item>
+    </organization>
+  </organizations>
+  <resources>
+    <resource identifier="RES-1" type="webcontent" adlcp:scormtype="sco" href="index.html"><file href="index.html"/></resource>
+  </resources>
+</manifest>
+"""
+
+def _minify(src):
+    lines = [line.strip() for line in src.strip().splitlines()]
+    out = "".join(line for line in lines if line)
+    return re.sub(r">\s+<", "><", out)
+
+TEMPLATE = _minify(_TEMPLATE_SRC)
+
+# --- ДАННЫЕ ---
+def _safe_json(data):
+    """JSON, который нельзя "закрыть" изнутри <script>"""
+    s = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return (s.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+             .replace("\u2028", "\\u2028").replace("\u2029", "\\u2029"))
+
+def quiz_payload(quiz_obj):
+    """Сериализованные данные викторины - они же ключ мемоизации"""
+    data = [{"question": q.scenario, "options": list(q.options), "correct": q.correct_option_id}
+            for q in quiz_obj.questions]
+    return _safe_json(data)
+
+@lru_cache(maxsize=64)
+def _render(payload, title, scorm):
+    html = (TEMPLATE.replace("{{TITLE}}", escape(title))
+                    .replace("{{SCORM}}", "true" if scorm else "false")
+                    .replace("{{PASS}}", str(PASS_RATIO))
+                    .replace("{{DATA}}", payload))
+    return html.encode("utf-8")
+
+@lru_cache(maxsize=32)
+def _package(payload, title):
+    buf = io.BytesIO()
+    ident = "VYUD-" + hashlib.sha1((title + payload).encode("utf-8")).hexdigest()[:12]
+    manifest = _MANIFEST.format(ident=ident, title=escape(title), mastery=int(PASS_RATIO * 100))
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("imsmanifest.xml", manifest)
+        zf.writestr("index.html", _render(payload, title, True))
+    return buf.getvalue()
+
+# --- ЭКСПОРТ ---
+def _cached(fn, kind, *args):
+    hits = fn.cache_info().hits
+    out = fn(*args)
+    metrics.inc("vyud_cache_requests_total", cache=kind, result="hit" if fn.cache_info().hits > hits else "miss")
+    return out
+
+def quiz_html(quiz_obj, title):
+    """Автономный HTML-тест (bytes)"""
+    return _cached(_render, "html_export", quiz_payload(quiz_obj), title, False)
+
+def scorm_package(quiz_obj, title):
+    """SCORM 1.2 zip: imsmanifest.xml + index.html, оценка уходит в LMS"""
+    return _cached(_package, "scorm_export", quiz_payload(quiz_obj), title)
@@ -0,0 +1,65 @@
+import auth
+import jobs
+import logic
+import metrics
+import question_bank
+import quiz_store
+import usage
+
+# --- ОБРАБОТЧИКИ ЗАДАЧ ---
+# Тот же конвейер, что был в app.py: файл -> текст -> тест (+ подсказки) -> сохранение -> списание.
+# Выполняются воркерами jobs.py в API-сервисе и в Streamlit.
+
+def _extract(job, f):
+    jobs.progress(job["job_id"], "extract", 0.1)
+    with metrics.span("extract", source="job"):
+        text = logic.extract_text_from_path(f["path"])
+    if not text or text.startswith("Error"):
+        raise logic.GenerationError(text or "Текст не извлечен")
+    return text
+
+@jobs.handler("extract")
+def run_extract(job):
+    f = jobs.get_file(job["params"]["file_id"], job["owner"])
+    if not f: raise FileNotFoundError("file not found")
+    with usage.job(job["owner"], job["job_id"]):
+        text = _extract(job, f)
+    return {"file_id": f["file_id"], "chars": len(text), "text": text}
+
+@jobs.handler("generate")
+def run_generate(job):
+    p, owner, job_id = job["params"], job["owner"], job["job_id"]
+    f = jobs.get_file(p["file_id"], owner)
+    if not f: raise FileNotFoundError("file not found")
+    cnt, bank_mode = p.get("num_questions", 5), p.get("bank", False)
+    diff, lang, topic = p.get("difficulty", "Medium"), p.get("language", "Russian"), p.get("topic")
+    title = p.get("title") or f["name"]
+    pkey = quiz_store.params_key(cnt, diff, lang, topic)
+
+    # Тот же файл с теми же настройками уже генерировали - кредит не списываем
+    stored = question_bank.find_bank(f["sha256"], pkey) if bank_mode else quiz_store.find_quiz(f["sha256"], pkey)
+    if stored:
+        key = "bank_id" if bank_mode else "share_id"
+        return {key: stored[key], "title": stored["title"], "reused": True, "credits": 0}
+
+    if auth.get_user_credits(owner) <= 0: raise PermissionError("Недостаточно кредитов")
+    with usage.job(owner, job_id):
+        text = _extract(job, f)
+        jobs.progress(job_id, "generate", 0.4)
+        n = question_bank.pool_size(cnt) if bank_mode else cnt
+        generated = logic.generate_quiz_ai(text, n, diff, lang, topic)
+        hints = ""
+        if p.get("hints", True):
+            jobs.progress(job_id, "hints", 0.8)
+            hints = logic.generate_methodologist_hints(text, lang)
+    jobs.progress(job_id, "save", 0.9)
+    # В ответе - фактически списанное (с учетом баланса), а не расчетная стоимость
+    credits = auth.deduct_credit(owner, job_id=job_id)
+    if credits is None:
+        metrics.log_event("charge_failed", job_id=job_id, owner=owner)
+        credits = 0
+    if bank_mode:
+        bank_id = question_bank.save_bank(owner, f["sha256"], pkey, title, generated, cnt, hints)
+        return {"bank_id": bank_id, "title": title, "reused": False, "credits": credits}
+    share_id = quiz_store.save_quiz(owner, f["sha256"], pkey, title, generated, hints)
+    return {"share_id": share_id, "title": title, "questions": len(generated.questions), "reused": False, "credits": credits}
@@ -0,0 +1,146 @@
+"""Массовая загрузка библиотеки курсов из каталога, без UI.
+
+    python ingest.py course_library/ --out vyud_out/ --workers 8
+    python ingest.py course_library/ --out vyud_out/ --mode process --workers 4 --student "Имя Фамилия"
+
+Для каждого файла: извлечение текста -> тест -> <out>/<путь файла>/quiz.json, quiz.html, certificate.pdf.
+Прогресс пишется в <out>/checkpoint.jsonl; повторный запуск пропускает уже готовые файлы
+(если файл не менялся). Тот же файл с теми же настройками берется из quizzes.db без вызова API.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import logic
+import metrics
+import quiz_store
+import usage
+
+CHECKPOINT = "checkpoint.jsonl"
+OWNER = os.environ.get("VYUD_INGEST_OWNER", "ingest@cli")
+
+# --- ФАЙЛЫ И ЧЕКПОИНТ ---
+def walk(src):
+    """Относительные пути поддерживаемых файлов, в стабильном порядке"""
+    exts = set(logic.DOC_EXTENSIONS) | set(logic.MEDIA_EXTENSIONS)
+    for root, dirs, files in os.walk(src):
+        dirs.sort()
+        for name in sorted(files):
+            if name.rsplit(".", 1)[-1].lower() in exts:
+                yield os.path.relpath(os.path.join(root, name), src)
+
+def fingerprint(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+def load_checkpoint(out):
+    """{relpath: fingerprint} для успешно обработанных файлов"""
+    done = {}
+    try:
+        with open(os.path.join(out, CHECKPOINT), encoding="utf-8") as f:
+            for line in f:
+                try: rec = json.loads(line)
+                except ValueError: continue  # недописанная строка после падения
+                if rec.get("status") == "done": done[rec["file"]] = rec["fingerprint"]
+                else: done.pop(rec["file"], None)
+    except FileNotFoundError:
+        pass
+    return done
+
+# --- ОБРАБОТКА ОДНОГО ФАЙЛА (в потоке или процессе) ---
+def process_file(src, rel, out, opts):
+    path = os.path.join(src, rel)
+    rec = {"file": rel, "fingerprint": fingerprint(path), "started": time.time()}
+    target = os.path.join(out, rel)
+    title = os.path.splitext(os.path.basename(rel))[0]
+    try:
+        with usage.job(opts["owner"]) as job_id:
+            rec["job_id"] = job_id
+            chash = quiz_store.file_hash(path)
+            params = quiz_store.params_key(opts["questions"], opts["difficulty"], opts["language"], opts["topic"])
+            stored = quiz_store.find_quiz(chash, params)
+            if stored:
+                quiz, rec["share_id"], rec["reused"] = stored["quiz"], stored["share_id"], True
+            else:
+                with metrics.span("extract", source="cli"):
+                    text = logic.extract_text_from_path(path)
+                if not text or text.startswith("Error"):
+                    raise logic.GenerationError(text or "Текст не извлечен")
+                with metrics.span("generate", source="cli"):
+                    quiz = logic.generate_quiz_ai(text, opts["questions"], opts["difficulty"], opts["language"], opts["topic"] or None)
+                hints = logic.generate_methodologist_hints(text, opts["language"]) if opts["hints"] else ""
+                rec["share_id"] = quiz_store.save_quiz(opts["owner"], chash, params, title, quiz, hints)
+        os.makedirs(target, exist_ok=True)
+        with open(os.path.join(target, "quiz.json"), "wb") as f: f.write(quiz.to_json())
+        with open(os.path.join(target, "quiz.html"), "wb") as f: f.write(logic.create_html_quiz(quiz, title))
+        if opts["certificate"]:
+            logo = io.BytesIO(opts["logo"]) if opts["logo"] else None
+            signature = io.BytesIO(opts["signature"]) if opts["signature"] else None
+            with open(os.path.join(target, "certificate.pdf"), "wb") as f:
+                f.write(logic.create_certificate(opts["student"], title, logo, signature))
+        rec.update(status="done", questions=len(quiz.questions), cost_usd=round(usage.job_cost(job_id), 5))
+    except Exception as e:
+        rec.update(status="failed", error=str(e)[:300])
+    rec["seconds"] = round(time.time() - rec.pop("started"), 2)
+    return rec
+
+# --- ЗАПУСК ---
+def run(src, out, opts, workers=4, mode="thread", limit=None):
+    os.makedirs(out, exist_ok=True)
+    done = load_checkpoint(out)
+    todo = [rel for rel in walk(src) if done.get(rel) != fingerprint(os.path.join(src, rel))]
+    if limit: todo = todo[:limit]
+    print(f"Файлов к обработке: {len(todo)} (уже готово: {len(done)})", flush=True)
+    pool_cls = ProcessPoolExecutor if mode == "process" else ThreadPoolExecutor
+    counts = {"done": 0, "failed": 0}
+    started = time.monotonic()
+    # Чекпоинт пишет только главный процесс - по строке на файл, сразу на диск
+    with open(os.path.join(out, CHECKPOINT), "a", encoding="utf-8") as cp, pool_cls(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, src, rel, out, opts) for rel in todo]
+        for i, fut in enumerate(as_completed(futures), 1):
+            rec = fut.result()
+            cp.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            cp.flush()
+            counts[rec["status"]] += 1
+            metrics.inc("vyud_ingest_files_total", status=rec["status"])
+            note = rec.get("error") or ("из кэша" if rec.get("reused") else f"{rec['seconds']}s")
+            print(f"[{i}/{len(todo)}] {rec['status']:6} {rec['file']} - {note}", flush=True)
+    elapsed = time.monotonic() - started
+    print(f"Готово: {counts['done']}, ошибок: {counts['failed']}, {elapsed:.0f}s", flush=True)
+    return counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("src")
+    ap.add_argument("--out", default="vyud_out")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--mode", choices=["thread", "process"], default="thread",
+                    help="thread - упор в API (по умолчанию), process - много локального извлечения/OCR")
+    ap.add_argument("--questions", type=int, default=5)
+    ap.add_argument("--difficulty", default="Medium")
+    ap.add_argument("--language", default="Russian")
+    ap.add_argument("--topic", default="")
+    ap.add_argument("--hints", action="store_true", help="также генерировать подсказки методиста")
+    ap.add_argument("--student", default="Student Name", help="имя в сертификате-образце")
+    ap.add_argument("--no-certificate", action="store_true")
+    ap.add_argument("--logo")
+    ap.add_argument("--signature")
+    ap.add_argument("--owner", default=OWNER, help="владелец тестов в quizzes.db и в леджере")
+    ap.add_argument("--limit", type=int)
+    a = ap.parse_args(argv)
+
+    def read(p):
+        if not p: return None
+        with open(p, "rb") as f: return f.read()
+
+    opts = {"questions": a.questions, "difficulty": a.difficulty, "language": a.language, "topic": a.topic,
+            "hints": a.hints, "owner": a.owner, "certificate": not a.no_certificate, "student": a.student,
+            "logo": read(a.logo), "signature": read(a.signature)}
+    counts = run(a.src, a.out, opts, a.workers, a.mode, a.limit)
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+import metrics
+
+# --- ОЧЕРЕДЬ ЗАДАЧ ---
+# Задачи и загруженные файлы лежат в SQLite (JOBS_DB), а не в памяти процесса: любой воркер
+# API / Streamlit может взять задачу из очереди и ответить про ее статус. Несколько процессов
+# одного хоста (uvicorn --workers N) делят одну базу на локальном диске. SQLite WAL на сетевом
+# томе (NFS и т.п.) небезопасен: несколько реплик на разных машинах - только с настоящей очередью/БД.
+JOBS_DB = os.environ.get("VYUD_JOBS_DB", "jobs.db")
+UPLOAD_DIR = os.environ.get("VYUD_UPLOAD_DIR", "uploads")
+POLL_INTERVAL = 1.0
+STALE_AFTER = 15 * 60      # running без обновлений дольше - воркер умер, задачу возвращаем в очередь
+HEARTBEAT = 60             # пока задача выполняется, пульс обновляется сам - живую задачу не перезапустят
+MAX_ATTEMPTS = 2
+TERMINAL = ("done", "failed")
+# Хранение: загрузка удаляется, когда ее задача завершилась (и других активных задач с ней нет);
+# sweep() раз в SWEEP_INTERVAL чистит неиспользованные загрузки старше FILE_TTL и старые строки задач
+FILE_TTL = float(os.environ.get("VYUD_UPLOAD_TTL_HOURS", "24")) * 3600
+JOB_TTL = float(os.environ.get("VYUD_JOB_TTL_DAYS", "7")) * 86400
+SWEEP_INTERVAL = 3600
+
+HANDLERS = {}
+_ready = False
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+_last_sweep = 0.0
+
+def _connect():
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_db():
+    global _ready
+    if _ready: return
+    conn = _connect()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS jobs
+                    (job_id TEXT PRIMARY KEY, owner TEXT, kind TEXT, status TEXT, stage TEXT, progress REAL,
+                     params TEXT, result TEXT, error TEXT, attempts INTEGER, worker TEXT,
+                     created_at REAL, updated_at REAL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS files
+                    (file_id TEXT PRIMARY KEY, owner TEXT, name TEXT, path TEXT, sha256 TEXT,
+                     size INTEGER, created_at REAL)""")
+    conn.commit()
+    conn.close()
+    _ready = True
+
+def _row_to_job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+# --- ФАЙЛЫ ---
+def add_file(owner, name, path, sha256, size):
+    init_db()
+    file_id = uuid.uuid4().hex[:16]
+    conn = _connect()
+    conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", (file_id, owner, name, path, sha256, size, time.time()))
+    conn.commit()
+    conn.close()
+    return file_id
+
+def store_upload(owner, name, fileobj, chunk=1 << 20):
+    """Копирует загруженный файл в UPLOAD_DIR кусками, считая sha256 по ходу; возвращает file_id"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    ext = name.rsplit(".", 1)[-1].lower()
+    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.{ext}")
+    h, size = hashlib.sha256(), 0
+    fileobj.seek(0)
+    with open(path, "wb") as out:
+        for block in iter(lambda: fileobj.read(chunk), b""):
+            h.update(block); size += len(block)
+            out.write(block)
+    return add_file(owner, name, path, h.hexdigest(), size)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def release_file(job):
+    """После завершения задачи: удаляет ее загрузку, если другим активным задачам она не нужна"""
+    file_id = job["params"].get("file_id")
+    if not file_id: return
+    conn = _connect()
+    try:
+        busy = conn.execute("""SELECT 1 FROM jobs WHERE status IN ('queued', 'running') AND job_id != ?
+                               AND json_extract(params, '$.file_id') = ? LIMIT 1""", (job["job_id"], file_id)).fetchone()
+        row = None if busy else conn.execute("SELECT path FROM files WHERE file_id=?", (file_id,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM files WHERE file_id=?", (file_id,))
+            conn.commit()
+    finally:
+        conn.close()
+    if row: _remove(row["path"])
+
+def sweep(now=None):
+    """Загрузки старше FILE_TTL без активных задач, файлы без записи в базе, завершенные задачи старше JOB_TTL"""
+    global _last_sweep
+    init_db()
+    now = now or time.time()
+    _last_sweep = now
+    conn = _connect()
+    try:
+        rows = conn.execute("""SELECT file_id, path FROM files WHERE created_at < ? AND file_id NOT IN
+                               (SELECT json_extract(params, '$.file_id') FROM jobs WHERE status IN ('queued', 'running')
+                                AND json_extract(params, '$.file_id') IS NOT NULL)""", (now - FILE_TTL,)).fetchall()
+        conn.executemany("DELETE FROM files WHERE file_id=?", [(r["file_id"],) for r in rows])
+        jobs_removed = conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                                    (now - JOB_TTL,)).rowcount
+        known = {r["path"] for r in conn.execute("SELECT path FROM files")}
+        conn.commit()
+    finally:
+        conn.close()
+    for r in rows: _remove(r["path"])
+    # Файлы без строки в files (процесс упал между записью и add_file)
+    orphans = 0
+    if os.path.isdir(UPLOAD_DIR):
+        for name in os.listdir(UPLOAD_DIR):
+            path = os.path.join(UPLOAD_DIR, name)
+            try:
+                if path not in known and now - os.path.getmtime(path) > FILE_TTL:
+                    _remove(path)
+                    orphans += 1
+            except OSError:
+                pass
+    metrics.inc("vyud_upload_files_removed_total", len(rows) + orphans)
+    metrics.inc("vyud_jobs_pruned_total", jobs_removed)
+    if rows or orphans or jobs_removed:
+        metrics.log_event("jobs_sweep", files=len(rows) + orphans, jobs=jobs_removed)
+
+def get_file(file_id, owner=None):
+    init_db()
+    conn = _connect()
+    row = conn.execute("SELECT * FROM files WHERE file_id=?", (file_id,)).fetchone()
+    conn.close()
+    if not row or (owner and row["owner"] != owner): return None
+    return dict(row)
+
+# --- ЗАДАЧИ ---
+def submit(owner, kind, params):
+    """Ставит задачу в очередь, возвращает job_id"""
+    init_db()
+    job_id = uuid.uuid4().hex[:12]
+    now = time.time()
+    conn = _connect()
+    conn.execute("INSERT INTO jobs VALUES (?, ?, ?, 'queued', 'queued', 0, ?, NULL, NULL, 0, NULL, ?, ?)",
+                 (job_id, owner, kind, json.dumps(params, ensure_ascii=False), now, now))
+    conn.commit()
+    conn.close()
+    metrics.inc("vyud_jobs_submitted_total", kind=kind)
+    _wakeup.set()
+    return job_id
+
+def get(job_id, owner=None):
+    init_db()
+    conn = _connect()
+    row = conn.execute("SELECT * FROM jobs WHERE job_id=?", (job_id,)).fetchone()
+    conn.close()
+    if not row or (owner and row["owner"] != owner): return None
+    return _row_to_job(row)
+
+def update(job_id, **fields):
+    """stage/progress/status/result/error; заодно продлевает "пульс" задачи"""
+    if "result" in fields: fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+    fields["updated_at"] = time.time()
+    cols = ", ".join(f"{k}=?" for k in fields)
+    conn = _connect()
+    conn.execute(f"UPDATE jobs SET {cols} WHERE job_id=?", (*fields.values(), job_id))
+    conn.commit()
+    conn.close()
+
+def progress(job_id, stage, value):
+    update(job_id, stage=stage, progress=value)
+
+def claim(worker_id):
+    """Атомарно забирает самую старую задачу из очереди (или None)"""
+    init_db()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()
+        # Зависшие running (воркер упал) - назад в очередь или в failed
+        conn.execute("""UPDATE jobs SET status=CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                        error=CASE WHEN attempts >= ? THEN 'worker lost' ELSE error END, updated_at=?
+                        WHERE status='running' AND updated_at < ?""", (MAX_ATTEMPTS, MAX_ATTEMPTS, now, now - STALE_AFTER))
+        row = conn.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row:
+            conn.execute("""UPDATE jobs SET status='running', stage='started', attempts=attempts+1, worker=?, updated_at=?
+                            WHERE job_id=?""", (worker_id, now, row["job_id"]))
+        conn.commit()
+    finally:
+        conn.close()
+    if not row: return None
+    metrics.observe("vyud_job_queue_wait_seconds", time.time() - row["created_at"], kind=row["kind"])
+    return _row_to_job(row)
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(HEARTBEAT):
+        try:
+            update(job_id)
+        except sqlite3.Error as e:
+            metrics.log_event("job_heartbeat_failed", job_id=job_id, error=str(e)[:200])
+
+def run(job):
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job["job_id"], stop), daemon=True).start()
+    try:
+        _run(job)
+    finally:
+        stop.set()
+
+def _run(job):
+    with metrics.span("job", kind=job["kind"]):
+        try:
+            result = HANDLERS[job["kind"]](job)
+            update(job["job_id"], status="done", stage="done", progress=1.0, result=result)
+        except Exception as e:
+            update(job["job_id"], status="failed", stage="failed", error=str(e)[:500])
+            metrics.log_event("job_failed", job_id=job["job_id"], kind=job["kind"], error=str(e)[:200])
+    metrics.inc("vyud_jobs_finished_total", kind=job["kind"], status=get(job["job_id"])["status"])
+    release_file(job)
+
+def wait(job_id, timeout=None, interval=POLL_INTERVAL):
+    """Блокирующее ожидание завершения (CLI, тесты)"""
+    end = time.monotonic() + timeout if timeout else None
+    while True:
+        job = get(job_id)
+        if job is None or job["status"] in TERMINAL: return job
+        if end and time.monotonic() > end: return job
+        time.sleep(interval)
+
+# --- ВОРКЕРЫ ---
+def _worker_loop(worker_id):
+    while True:
+        # Любая ошибка (например "database is locked" в update/get) не должна убивать поток:
+        # задача без обновлений вернется в очередь через STALE_AFTER
+        try:
+            job = claim(worker_id)
+            if job:
+                run(job)
+                continue
+            if time.time() - _last_sweep > SWEEP_INTERVAL: sweep()
+        except Exception as e:
+            metrics.inc("vyud_job_worker_errors_total")
+            metrics.log_event("job_worker_error", worker=worker_id, error=str(e)[:200])
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+
+def start_workers(n=None):
+    """Потоки-исполнители в этом процессе; повторный вызов ничего не делает"""
+    import handlers  # noqa: F401 - регистрирует обработчики
+    with _workers_lock:
+        if _workers: return
+        n = n or int(os.environ.get("VYUD_JOB_WORKERS", "4"))
+        for i in range(n):
+            worker_id = f"{os.getpid()}-{i}"
+            t = threading.Thread(target=_worker_loop, args=(worker_id,), daemon=True, name=f"job-worker-{i}")
+            t.start()
+            _workers.append(t)
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
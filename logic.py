@@ -3,140 +3,181 @@ from openai import OpenAI
 import json
 import os
 import PyPDF2
-from docx import Document
-import moviepy.editor as mp
-from tempfile import NamedTemporaryFile
 import io
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import landscape, A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+import docx_stream
+import export
+import media
+import metrics
+import ocr
+import usage
+import textprep
+import retrieval
+import quality
+import resilience
+import routing
+import scratch
+import stt
+import time
+from models import Quiz, QuizQuestion, QuizFormatError
 
 # --- КОНФИГУРАЦИЯ ---
-MODEL_GPT = "gpt-4o"
+MODEL_GPT = "gpt-4o"       # модель по умолчанию; по задачам выбирает routing (routing.toml)
 MODEL_WHISPER = "whisper-1"
+QUIZ_TOKEN_BUDGET = 8000   # раньше - срез text[:25000] символов
+HINTS_TOKEN_BUDGET = 1500
+EXTRACT_TOKEN_LIMIT = int(os.environ.get("VYUD_EXTRACT_TOKEN_LIMIT", "200000"))  # потолок извлечения; retrieval выбирает из всего
+# Длинный документ (или запрос "по теме") - контекст собирается из индекса, а не префиксом
+RETRIEVAL_ENABLED = os.environ.get("VYUD_RETRIEVAL", "1") == "1"
+MAX_REPAIR_ROUNDS = 2      # дозапросы недостающих вопросов после фильтра качества
+QUIZ_CHUNK = 20            # вопросов за один запрос: пул банка (до 60) - несколькими запросами,
+                           # иначе один ответ не укладывается в QUIZ_HEDGE_AFTER/LLM_TIMEOUT
+# Таймауты и хеджирование (секунды): SDK сам не повторяет, повторы - в resilience
+LLM_TIMEOUT = float(os.environ.get("VYUD_LLM_TIMEOUT", "90"))
+QUIZ_DEADLINE = float(os.environ.get("VYUD_QUIZ_DEADLINE", "180"))
+QUIZ_HEDGE_AFTER = float(os.environ.get("VYUD_QUIZ_HEDGE_AFTER", "45"))
+HINTS_DEADLINE = 30.0
+HINTS_HEDGE_AFTER = 10.0
+WHISPER_TIMEOUT = 300.0
 
-class QuizQuestion:
-    def __init__(self, scenario, options, correct_option_id, explanation=""):
-        self.scenario = scenario
-        self.options = options
-        self.correct_option_id = correct_option_id
-        self.explanation = explanation
+class GenerationError(RuntimeError):
+    pass
 
-class Quiz:
-    def __init__(self, questions):
-        self.questions = questions
+def get_api_key():
+    try:
+        return st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        return os.environ.get("OPENAI_API_KEY")
 
-def get_client(api_key):
-    return OpenAI(api_key=api_key)
+def get_client(api_key, timeout=None):
+    return OpenAI(api_key=api_key, timeout=timeout or LLM_TIMEOUT, max_retries=0)
 
-# --- 1. ОБРАБОТКА ФАЙЛОВ ---
-def process_file_to_text(uploaded_file, api_key):
-    client = get_client(api_key)
-    file_ext = uploaded_file.name.split('.')[-1].lower()
-    text_content = ""
+def whisper_request(client, audio_path, model, deadline=None):
+    """Whisper с повторами; файл переоткрывается на каждую попытку"""
+    def attempt():
+        with open(audio_path, "rb") as audio_file:
+            return client.audio.transcriptions.create(model=model, file=audio_file, response_format="text")
+    return resilience.call(attempt, "openai_audio", deadline=deadline, attempts=2)
 
-    try:
-        # PDF
-        if file_ext == 'pdf':
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            for page in pdf_reader.pages: text_content += page.extract_text() + "\n"
-        
-        # DOCX
-        elif file_ext in ['docx', 'doc']:
-            doc = Document(uploaded_file)
-            text_content = "\n".join([para.text for para in doc.paragraphs])
-        
-        # TEXT
-        elif file_ext == 'txt':
-            text_content = uploaded_file.getvalue().decode("utf-8")
-        
-        # ВИДЕО И АУДИО (ГЛАВНАЯ ЧАСТЬ)
-        elif file_ext in ['mp4', 'mov', 'avi', 'mkv', 'mp3', 'wav', 'm4a', 'mpeg4', 'webm', 'wmv']:
-            with st.status("🎬 Обработка видео/аудио...", expanded=True) as status:
-                status.write("1. Извлекаем аудиодорожку...")
-                text_content = transcribe_audio_video(uploaded_file, client, status)
-                status.update(label="✅ Готово!", state="complete", expanded=False)
+def record_usage(response, task, model, route=None, latency=None):
+    """Токены из response.usage - в счетчики метрик, леджер текущей задачи и статистику маршрута"""
+    u = getattr(response, "usage", None)
+    if not u: return
+    metrics.inc("vyud_llm_tokens_total", u.prompt_tokens or 0, task=task, model=model, kind="prompt")
+    metrics.inc("vyud_llm_tokens_total", u.completion_tokens or 0, task=task, model=model, kind="completion")
+    usage.record_llm(model, task, u)
+    if route and latency is not None:
+        routing.record(route, latency, usage.token_cost(model, u.prompt_tokens or 0, u.completion_tokens or 0))
 
-    except Exception as e:
-        st.error(f"❌ Ошибка обработки файла: {e}")
-        return ""
+DOC_EXTENSIONS = ['pdf', 'docx', 'doc', 'txt']
+MEDIA_EXTENSIONS = ['mp4', 'mov', 'avi', 'mkv', 'mp3', 'wav', 'm4a', 'mpeg4', 'webm', 'wmv', 'ogg', 'oga', 'opus']
 
-    if not text_content:
-        st.warning("⚠️ Текст не извлечен. Возможно, файл пустой или видео без звука.")
-    
+# --- 1. ОБРАБОТКА ФАЙЛОВ ---
+def extract_document_text(source, file_ext):
+    """Текст из PDF/DOCX/TXT - source может быть путем или файловым объектом"""
+    with metrics.span("extract", kind=file_ext) as sp:
+        text_content = _extract_document_text(source, file_ext)
+        sp["chars"] = len(text_content)
     return text_content
 
-def transcribe_audio_video(uploaded_file, client, status_container):
-    try:
-        # Сохраняем во временный файл
-        suffix = f".{uploaded_file.name.split('.')[-1]}"
-        with NamedTemporaryFile(delete=False, suffix=suffix) as tmp_video:
-            tmp_video.write(uploaded_file.getvalue())
-            tmp_video_path = tmp_video.name
+def _extract_document_text(source, file_ext):
+    text_content = ""
+    # PDF
+    if file_ext == 'pdf':
+        pdf_reader = PyPDF2.PdfReader(source)
+        pages = [page.extract_text() or "" for page in pdf_reader.pages]
+        # Страницы без текстового слоя (сканы) - через OCR
+        scanned = [i for i, t in enumerate(pages) if ocr.needs_ocr(t)]
+        if scanned and ocr.available():
+            try:
+                for i, t in ocr.ocr_pages(source, pdf_reader, scanned).items(): pages[i] = t
+            except Exception as e:
+                metrics.log_event("ocr_failed", error=str(e)[:200])
+        # Страницы через \f - по ним textprep находит колонтитулы
+        text_content = textprep.PAGE_BREAK.join(pages)
 
-        audio_path = tmp_video_path + "_converted.mp3"
-        
-        # Конвертация через MoviePy (требует FFMPEG)
-        status_container.write("2. Конвертация в формат MP3 (32kbps)...")
-        
-        if suffix.lower() in ['.mp4', '.mov', '.avi', '.mkv', '.webm', '.wmv', '.mpeg4']:
-            video = mp.VideoFileClip(tmp_video_path)
-            # Если видео длиннее 20 минут - режем
-            if video.duration > 1200: 
-                status_container.warning(f"Видео длинное ({int(video.duration)}с). Берем первые 20 мин.")
-                video = video.subclip(0, 1200)
-            
-            video.audio.write_audiofile(audio_path, bitrate="32k", logger=None)
-            video.close()
+    # DOCX
+    elif file_ext in ['docx', 'doc']:
+        # Потоково, с таблицами и колонтитулами, с остановкой на EXTRACT_TOKEN_LIMIT
+        text_content = docx_stream.read_text(source, EXTRACT_TOKEN_LIMIT)
+
+    # TEXT
+    elif file_ext == 'txt':
+        if isinstance(source, str):
+            with open(source, "rb") as f: text_content = f.read().decode("utf-8", errors="ignore")
         else:
-            # Аудио тоже прогоняем через конвертер для сжатия
-            audio_clip = mp.AudioFileClip(tmp_video_path)
-            audio_clip.write_audiofile(audio_path, bitrate="32k", logger=None)
-            audio_clip.close()
+            text_content = source.getvalue().decode("utf-8")
+    return text_content
 
-        # Проверка размера
-        size_mb = os.path.getsize(audio_path) / (1024*1024)
-        status_container.write(f"3. Отправка в Whisper AI ({size_mb:.1f} MB)...")
+def extract_text_from_path(file_path):
+    """Общая точка извлечения текста для бота - документы и медиа по пути к файлу"""
+    file_ext = file_path.split('.')[-1].lower()
+    if file_ext in DOC_EXTENSIONS:
+        try:
+            return extract_document_text(file_path, file_ext)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    if file_ext in MEDIA_EXTENSIONS:
+        return transcribe_for_bot(file_path)
+    return f"Error: Unsupported file type .{file_ext}"
 
-        if size_mb > 24:
-            st.error("Файл слишком большой (>25MB) даже после сжатия.")
-            return ""
+def transcribe_file(file_path, client, source, status=None):
+    """Медиафайл по пути -> текст. Аудио готовит media.prepare_audio (только аудиодорожка,
+    без пауз, с ускорением), распознает stt.transcribe (Whisper API или локальный движок).
+    Промежуточный файл - в scratch-каталоге задачи, рядом с исходником ничего не пишем"""
+    with scratch.job("stt") as sd:
+        if status: status.write("2. Извлекаем аудио, убираем паузы...")
+        with metrics.span("ffmpeg", source=source):
+            info = media.prepare_audio(file_path, sd.path("audio"))
+        sd.check()
+        if status and info["duration_in"] >= media.MAX_SECONDS:
+            status.warning(f"Запись длинная. Берем первые {media.MAX_SECONDS // 60} мин.")
 
-        with open(audio_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model=MODEL_WHISPER, file=audio_file, response_format="text"
-            )
-        
-        # Чистка
-        try: os.remove(tmp_video_path); os.remove(audio_path)
-        except: pass
-        
-        return transcript
-
-    except Exception as e:
-        st.error(f"Ошибка транскрибации (FFMPEG/Whisper): {str(e)}")
-        if "ffmpeg" in str(e).lower():
-            st.error("🚨 На сервере не найден FFMPEG. Установите: sudo apt install ffmpeg")
-        return ""
+        backend = stt.backend_for(info["duration_out"])
+        size_mb = os.path.getsize(info["path"]) / (1024*1024)
+        if status: status.write(f"3. Распознавание речи ({backend}, {size_mb:.1f} MB, сэкономлено {info['seconds_saved']:.0f} с)...")
+        with metrics.span("stt", source=source):
+            return stt.transcribe(info["path"], info["duration_out"], client)
 
 # --- 2. ГЕНЕРАЦИЯ ТЕСТА ---
-def generate_quiz_ai(text, num_questions, difficulty, language):
-    client = get_client(st.secrets["OPENAI_API_KEY"])
-    if not text: return Quiz([])
-    
-    prompt = f"""
+def prepare_text(text, budget, task, topic=None):
+    """Чистка колонтитулов/переносов/дублей и обрезка по бюджету токенов.
+    Если текст не влезает в бюджет или задана тема - выбираем чанки из индекса документа"""
+    with metrics.span("textprep", task=task) as sp:
+        # Нормализуем один раз: тот же чистый текст идет и в обрезку, и в индекс retrieval
+        clean = textprep.normalize(text)
+        prepared, stats = textprep.prepare(text, budget, MODEL_GPT, clean)
+        sp.update(stats)
+    metrics.inc("vyud_textprep_chars_removed_total", stats["chars_in"] - stats["chars_clean"], task=task)
+    if RETRIEVAL_ENABLED and (topic or stats["chars_out"] < stats["chars_clean"]):
+        try:
+            with metrics.span("retrieval", task=task, mode="topic" if topic else "representative"):
+                selected = retrieval.select_context(clean, budget, topic)
+            if selected: return selected
+        except Exception as e:
+            metrics.log_event("retrieval_fallback", task=task, error=str(e))
+    return prepared
+
+def build_quiz_prompt(text, num_questions, difficulty, language, topic=None, avoid=()):
+    topic_line = f"\n- Focus every question on this topic: {topic}" if topic else ""
+    avoid_line = ""
+    if avoid:
+        avoid_line = "\n- Do NOT repeat or paraphrase these existing questions:\n" + "\n".join(f"  * {a}" for a in avoid)
+    return f"""
 You are an expert quiz creator. Create an engaging quiz based on the following text.
 
 TEXT:
-{text[:25000]}
+{text}
 
 REQUIREMENTS:
 - Language: {language}
 - Difficulty: {difficulty}
-- Number of questions: {num_questions}
+- Number of questions: {num_questions}{topic_line}
 - Each question must have exactly 4 options
-- Include a brief explanation (1-2 sentences) for why the correct answer is right
+- Include a brief explanation (1-2 sentences) for why the correct answer is right{avoid_line}
 
 OUTPUT FORMAT (strict JSON):
 {{
@@ -150,61 +191,113 @@ OUTPUT FORMAT (strict JSON):
   ]
 }}
 """
+
+def request_questions(client, prompt, task="quiz", deadline=None, route=None):
+    """Сырой список вопросов из ответа модели"""
+    route = route or routing.route("quiz")
+    t = time.perf_counter()
+    with metrics.span("llm", task=task, model=route.model, route=route.name):
+        response = resilience.call(
+            lambda timeout: client.chat.completions.create(
+                model=route.model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+                timeout=timeout
+            ),
+            "openai", deadline=deadline, hedge_after=QUIZ_HEDGE_AFTER, timeout=LLM_TIMEOUT,
+            on_extra=lambda r: record_usage(r, task, route.model))
+    record_usage(response, task, route.model, route, time.perf_counter() - t)
+    data = json.loads(response.choices[0].message.content)
+    if not isinstance(data, dict): raise QuizFormatError("response is not a JSON object")
+    return data.get("questions")
+
+def generate_quiz_ai(text, num_questions, difficulty, language, topic=None):
+    client = get_client(get_api_key())
+    if not text or not text.strip(): raise GenerationError("Нет текста для генерации теста")
+    text = prepare_text(text, QUIZ_TOKEN_BUDGET, "quiz", topic)
+
+    # Большой пул - частями по QUIZ_CHUNK, дедлайн - на каждую часть
+    chunks = -(-num_questions // QUIZ_CHUNK)
+    deadline = resilience.Deadline(QUIZ_DEADLINE * chunks)
+    route = routing.route("quiz", textprep.count_tokens(text, MODEL_GPT), difficulty)
     try:
-        response = client.chat.completions.create(
-            model=MODEL_GPT,
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        data = json.loads(response.choices[0].message.content)
-        return Quiz([QuizQuestion(q['scenario'], q['options'], q['correct_option_id'], q.get('explanation', '')) for q in data['questions']])
-    except Exception as e: return Quiz([QuizQuestion(f"Error: {e}", ["OK"], 0)])
+        prompt = build_quiz_prompt(text, min(num_questions, QUIZ_CHUNK), difficulty, language, topic)
+        questions = quality.clean(request_questions(client, prompt, deadline=deadline, route=route))
+    except Exception as e:
+        raise GenerationError(f"Не удалось сгенерировать тест: {e}") from e
+
+    # Следующие части пула, затем дозапросы вместо отсеянных битых и повторяющихся вопросов
+    for i in range(chunks - 1 + MAX_REPAIR_ROUNDS):
+        missing = num_questions - len(questions)
+        if missing <= 0 or deadline.expired: break
+        task = "quiz_chunk" if i < chunks - 1 else "quiz_repair"
+        if task == "quiz_repair": metrics.inc("vyud_quality_repair_requests_total")
+        prompt = build_quiz_prompt(text, min(missing, QUIZ_CHUNK), difficulty, language, topic,
+                                   [q.scenario for q in questions])
+        try:
+            questions += quality.clean(request_questions(client, prompt, task, deadline, route), questions)
+        except Exception as e:
+            # Дозапрос не критичен - отдаем то, что уже есть
+            metrics.log_event("quiz_repair_failed", task=task, error=str(e)[:200])
+            break
+    if not questions: raise GenerationError("Модель не вернула ни одного корректного вопроса")
+    return Quiz(questions[:num_questions])
 
 def generate_methodologist_hints(text, language):
     if not text: return "Нет текста."
-    client = get_client(st.secrets["OPENAI_API_KEY"])
+    client = get_client(get_api_key())
+    text = prepare_text(text, HINTS_TOKEN_BUDGET, "hints")
+    route = routing.route("hints", textprep.count_tokens(text, MODEL_GPT))
     try:
-        res = client.chat.completions.create(
-            model=MODEL_GPT, messages=[{"role": "user", "content": f"3 learning tips for: {text[:5000]}. Lang: {language}"}]
-        )
+        t = time.perf_counter()
+        with metrics.span("llm", task="hints", model=route.model, route=route.name):
+            res = resilience.call(
+                lambda timeout: client.chat.completions.create(
+                    model=route.model, messages=[{"role": "user", "content": f"3 learning tips for: {text}. Lang: {language}"}],
+                    timeout=timeout
+                ),
+                "openai", deadline=resilience.Deadline(HINTS_DEADLINE), attempts=2,
+                hedge_after=HINTS_HEDGE_AFTER, timeout=HINTS_DEADLINE,
+                on_extra=lambda r: record_usage(r, "hints", route.model))
+        record_usage(res, "hints", route.model, route, time.perf_counter() - t)
         return res.choices[0].message.content
-    except: return "Советы недоступны."
+    except Exception as e:
+        # Подсказки необязательны: пустая строка - блок просто не показывается
+        metrics.log_event("hints_failed", error=str(e)[:200])
+        return ""
 
 # --- 3. ЭКСПОРТ ---
 def create_html_quiz(quiz_obj, filename):
-    js_data = []
-    for q in quiz_obj.questions:
-        js_data.append({"question": q.scenario, "options": q.options, "correct": q.correct_option_id})
-    json_str = json.dumps(js_data)
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html><head><meta charset='UTF-8'><style>body{{font-family:sans-serif;padding:20px;max-width:800px;margin:0 auto}} .card{{border:1px solid #ccc;padding:15px;margin-bottom:15px;border-radius:8px}} .btn{{background:#007bff;color:white;padding:10px 20px;border:none;cursor:pointer}} .correct{{color:green;font-weight:bold}} .wrong{{color:red;font-weight:bold}}</style></head>
-    <body><h1>Test: {filename}</h1><div id="q"></div><button class="btn" onclick="check()">Check</button><h2 id="sc"></h2>
-    <script>const d={json_str}; function r(){{let h='';d.forEach((q,i)=>{{h+=`<div class='card'><h3>${{i+1}}. ${{q.question}}</h3>`;q.options.forEach((o,j)=>{{h+=`<label style='display:block'><input type='radio' name='q${{i}}' value='${{j}}'> ${{o}}</label>`}});h+=`<div id='r${{i}}'></div></div>`}});document.getElementById('q').innerHTML=h}} r();
-    function check(){{let s=0;d.forEach((q,i)=>{{let el=document.querySelector(`input[name='q${{i}}']:checked`);let r=document.getElementById(`r${{i}}`);if(el&&parseInt(el.value)===q.correct){{s++;r.innerHTML="<span class='correct'>OK</span>"}}else{{r.innerHTML=`<span class='wrong'>Wrong. Answer: ${{q.options[q.correct]}}</span>`}}}});document.getElementById('sc').innerText=`Score: ${{s}}/${{d.length}}`}}</script></body></html>
-    """
-    return html.encode('utf-8')
+    return export.quiz_html(quiz_obj, filename)
+
+def create_scorm_package(quiz_obj, filename):
+    return export.scorm_package(quiz_obj, filename)
 
 def remove_white_background(img):
+    from PIL import ImageChops
     if img.mode != "RGBA":
         img = img.convert("RGBA")
-    datas = img.getdata()
-    new_data = []
-    for item in datas:
-        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-            new_data.append((255, 255, 255, 0))
-        else:
-            new_data.append(item)
-    img.putdata(new_data)
+    # Маска "почти белых" пикселей считается в C внутри PIL, без цикла по пикселям
+    r, g, b, _ = img.split()
+    white = lambda ch: ch.point(lambda v: 255 if v > 240 else 0)
+    mask = ImageChops.multiply(ImageChops.multiply(white(r), white(g)), white(b))
+    img.paste((255, 255, 255, 0), mask=mask)
     return img
 
-def create_certificate(student_name, course_name, logo_file=None, signature_file=None):
+def certificate_id():
+    import random
+    return f"VYUD-{random.randint(10000,99999)}"
+
+def create_certificate(student_name, course_name, logo_file=None, signature_file=None, cert_id=None, issued=None):
+    """cert_id и issued (дата) можно передать снаружи - иначе новые при каждом вызове"""
+    with metrics.span("pdf_render"):
+        return _create_certificate(student_name, course_name, logo_file, signature_file, cert_id, issued)
+
+def _create_certificate(student_name, course_name, logo_file=None, signature_file=None, cert_id=None, issued=None):
     from reportlab.lib.colors import HexColor
     from reportlab.lib.utils import ImageReader
     from PIL import Image
     from datetime import datetime
-    import random
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=landscape(A4))
     width, height = landscape(A4)
@@ -276,56 +369,18 @@ def create_certificate(student_name, course_name, logo_file=None, signature_file
         except: pass
     c.setFillColor(muted)
     c.setFont("Helvetica", 12)
-    dt = datetime.now().strftime("%B %d, %Y")
+    dt = (issued or datetime.now()).strftime("%B %d, %Y")
     c.drawRightString(width-80, 80, f"Issued: {dt}")
     c.setFont("Helvetica", 10)
-    cid = f"VYUD-{random.randint(10000,99999)}"
+    cid = cert_id or certificate_id()
     c.drawRightString(width-80, 60, f"Certificate ID: {cid}")
     c.save()
     buffer.seek(0)
     return buffer.getvalue()
 
 def transcribe_for_bot(file_path):
-    """Транскрибация для Telegram бота - принимает путь к файлу"""
+    """Транскрибация по пути к файлу (бот, CLI, фоновые задачи); исходник не удаляет"""
     try:
-        import os
-        from openai import OpenAI
-        
-        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        
-        # Конвертация в mp3 (если это видео)
-        audio_path = file_path + "_converted.mp3"
-        
-        if file_path.lower().endswith(('.mp4', '.mov', '.avi', '.mkv', '.webm')):
-            video = mp.VideoFileClip(file_path)
-            if video.duration > 1200:
-                video = video.subclip(0, 1200)
-            video.audio.write_audiofile(audio_path, bitrate="32k", logger=None)
-            video.close()
-        else:
-            # Аудио - тоже конвертируем для сжатия
-            audio_clip = mp.AudioFileClip(file_path)
-            audio_clip.write_audiofile(audio_path, bitrate="32k", logger=None)
-            audio_clip.close()
-        
-        # Проверка размера
-        size_mb = os.path.getsize(audio_path) / (1024*1024)
-        if size_mb > 24:
-            return "Error: File too large"
-        
-        # Whisper
-        with open(audio_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1", file=audio_file, response_format="text"
-            )
-        
-        # Чистка
-        try: 
-            os.remove(file_path)
-            os.remove(audio_path)
-        except: pass
-        
-        return transcript
-        
+        return transcribe_file(file_path, None, "bot")
     except Exception as e:
         return f"Error: {str(e)}"
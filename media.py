@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import shutil
+import subprocess
+import metrics
+
+# --- ПОДГОТОВКА АУДИО ДЛЯ РАСПОЗНАВАНИЯ ---
+# Сначала ffprobe; затем один вызов ffmpeg: только аудиодорожка (-vn), обрезка до MAX_SECONDS, вырезание пауз
+# (silenceremove), ускорение без сдвига тона (atempo), моно 16 кГц 32 kbps.
+# Whisper тарифицируется и работает пропорционально длительности - паузы и темп экономят и то, и другое.
+MAX_SECONDS = 1200                 # как раньше: длинные видео - первые 20 минут
+TRIM_SILENCE = os.environ.get("VYUD_TRIM_SILENCE", "1") == "1"
+SILENCE_THRESHOLD = "-40dB"
+SILENCE_MIN = 0.7                  # паузы длиннее - вырезаем...
+SILENCE_KEEP = 0.3                 # ...оставляя столько тишины, чтобы не склеивать слова
+TRIM_MIN_SECONDS = 120            # короче - паузы не режем: экономия копеечная, а без фильтров работают direct/copy
+AUDIO_TEMPO = float(os.environ.get("VYUD_AUDIO_TEMPO", "1.0"))   # напр. 1.5 - ускорение (дешевле, но хуже точность)
+SAMPLE_RATE = 16000                # Whisper все равно работает на 16 кГц
+BITRATE = "32k"
+FFMPEG_TIMEOUT = 600
+PROBE_TIMEOUT = 30
+WHISPER_MAX_MB = 24
+# Что Whisper API принимает как есть; кодек -> контейнер для копирования дорожки без перекодирования
+WHISPER_FORMATS = {"mp3", "mp4", "m4a", "mpeg", "mpga", "wav", "webm", "ogg", "oga", "flac"}
+COPY_CONTAINERS = {"aac": "m4a", "mp3": "mp3", "opus": "ogg", "vorbis": "ogg", "flac": "flac"}
+
+_TIME = re.compile(r"(\d+):(\d\d):(\d\d(?:\.\d+)?)")
+
+class MediaError(RuntimeError):
+    pass
+
+def ffmpeg_exe():
+    """ffmpeg из PATH, иначе бинарник из pip-пакета imageio-ffmpeg"""
+    exe = shutil.which("ffmpeg")
+    if exe: return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise MediaError("ffmpeg not found: sudo apt install ffmpeg")
+
+def ffprobe_exe():
+    return shutil.which("ffprobe")
+
+def _seconds(hms):
+    h, m, s = hms
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+def audio_filters(trim_silence=TRIM_SILENCE, tempo=AUDIO_TEMPO):
+    filters = []
+    if trim_silence:
+        filters.append(f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}"
+                       f":stop_periods=-1:stop_duration={SILENCE_MIN}:stop_threshold={SILENCE_THRESHOLD}"
+                       f":stop_silence={SILENCE_KEEP}")
+    # atempo меняет темп без изменения высоты тона; один фильтр - не больше 2.0
+    while tempo > 2.0:
+        filters.append("atempo=2.0")
+        tempo /= 2.0
+    if tempo != 1.0:
+        filters.append(f"atempo={tempo:g}")
+    return filters
+
+# --- ПРОБА ФАЙЛА ---
+def probe(src):
+    """Длительность, аудиокодек и наличие видео - без декодирования (ffprobe, иначе заголовок ffmpeg -i)"""
+    exe = ffprobe_exe()
+    if exe:
+        proc = subprocess.run([exe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", src],
+                              capture_output=True, text=True, errors="replace", timeout=PROBE_TIMEOUT)
+        if proc.returncode != 0: raise MediaError(f"ffprobe failed: {proc.stderr.strip()[:200]}")
+        data = json.loads(proc.stdout or "{}")
+        streams = data.get("streams", [])
+        audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+        return {"duration": float(data.get("format", {}).get("duration") or 0),
+                "audio_codec": audio.get("codec_name") if audio else None,
+                "has_video": any(st.get("codec_type") == "video" and not st.get("disposition", {}).get("attached_pic")
+                                 for st in streams)}
+    # ffmpeg -i без выхода печатает заголовок и завершается с ошибкой - это ожидаемо
+    proc = subprocess.run([ffmpeg_exe(), "-hide_banner", "-nostdin", "-i", src],
+                          capture_output=True, text=True, errors="replace", timeout=PROBE_TIMEOUT)
+    m = re.search(r"Duration:\s*" + _TIME.pattern, proc.stderr)
+    a = re.search(r"Stream #\S+.*?: Audio: (\w+)", proc.stderr)
+    return {"duration": _seconds(m.groups()) if m else 0.0, "audio_codec": a.group(1) if a else None,
+            "has_video": bool(re.search(r"Stream #\S+.*?: Video: (?!mjpeg|png)", proc.stderr))}
+
+# --- ПОДГОТОВКА ---
+def prepare_audio(src, dst_base, max_seconds=MAX_SECONDS, trim_silence=TRIM_SILENCE, tempo=AUDIO_TEMPO):
+    """src (видео/аудио) -> аудиофайл для распознавания. Самый дешевый из путей:
+    direct - исходник уже подходит Whisper (без ffmpeg вообще), copy - дорожка копируется
+    без перекодирования, transcode - один проход ffmpeg с фильтрами. Видео никогда не декодируется.
+    Возвращает путь (может совпадать с src), режим и длительности"""
+    with metrics.span("ffprobe"):
+        info = probe(src)
+    if not info["audio_codec"]: raise MediaError("no audio track")
+    duration = min(info["duration"], max_seconds) if info["duration"] else 0.0
+    filters = audio_filters(trim_silence and info["duration"] > TRIM_MIN_SECONDS, tempo)
+    fits = info["duration"] and info["duration"] <= max_seconds
+    if not filters:
+        ext = src.rsplit(".", 1)[-1].lower()
+        if (fits and not info["has_video"] and ext in WHISPER_FORMATS
+                and os.path.getsize(src) <= WHISPER_MAX_MB * 1024 * 1024):
+            return _done(src, "direct", duration, duration)
+        container = COPY_CONTAINERS.get(info["audio_codec"])
+        if container:
+            dst = f"{dst_base}.{container}"
+            _ffmpeg([ffmpeg_exe(), "-hide_banner", "-nostdin", "-y", "-t", str(max_seconds), "-i", src,
+                     "-map", "0:a:0", "-vn", "-c:a", "copy", dst], "copy")
+            if os.path.getsize(dst) <= WHISPER_MAX_MB * 1024 * 1024:
+                return _done(dst, "copy", duration, duration)
+            os.remove(dst)
+    return _transcode(src, f"{dst_base}.mp3", max_seconds, filters, duration)
+
+def _ffmpeg(cmd, mode):
+    with metrics.span("ffmpeg_prepare", mode=mode):
+        proc = subprocess.run(cmd, capture_output=True, text=True, errors="replace", timeout=FFMPEG_TIMEOUT)
+    if proc.returncode != 0:
+        raise MediaError(f"ffmpeg failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}")
+    return proc
+
+def _done(path, mode, duration_in, duration_out):
+    saved = max(0.0, duration_in - duration_out)
+    metrics.inc("vyud_audio_prepare_total", mode=mode)
+    metrics.inc("vyud_audio_seconds_saved_total", saved)
+    metrics.log_event("audio_prepared", mode=mode, seconds_in=round(duration_in, 1),
+                      seconds_out=round(duration_out, 1), seconds_saved=round(saved, 1))
+    return {"path": path, "mode": mode, "duration_in": duration_in, "duration_out": duration_out, "seconds_saved": saved}
+
+def _transcode(src, dst, max_seconds, filters, duration_in):
+    cmd = [ffmpeg_exe(), "-hide_banner", "-nostdin", "-y", "-t", str(max_seconds), "-i", src, "-map", "0:a:0", "-vn"]
+    if filters: cmd += ["-af", ",".join(filters)]
+    cmd += ["-ac", "1", "-ar", str(SAMPLE_RATE), "-b:a", BITRATE, dst]
+    proc = _ffmpeg(cmd, "transcode")
+    # Длительность выхода - последний "time=" в прогрессе ffmpeg (уже после вырезания пауз и ускорения)
+    times = re.findall(r"time=" + _TIME.pattern, proc.stderr)
+    duration_out = _seconds(times[-1]) if times else duration_in
+    return _done(dst, "transcode", duration_in, duration_out)
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- МЕТРИКИ ---
+# Счетчики, гауги и гистограммы в памяти процесса.
+# Экспорт: текст Prometheus (/metrics через serve()) и JSON-строки в логгер "vyud.metrics".
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+STAGE_HISTOGRAM = "vyud_stage_duration_seconds"
+
+log = logging.getLogger("vyud.metrics")
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_server = None
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def inc(name, value=1, **labels):
+    if not value: return
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def observe(name, value, **labels):
+    k = _key(name, labels)
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h["buckets"][i] += 1
+        h["sum"] += value
+        h["count"] += 1
+
+def log_event(event, **fields):
+    log.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False, default=str))
+
+@contextmanager
+def span(stage, **labels):
+    """Замер стадии: гистограмма длительности + JSON-строка в лог.
+    Внутри можно дописать поля: with span("llm") as s: s["tokens"] = 100"""
+    fields = {}
+    status = "ok"
+    t = time.perf_counter()
+    try:
+        yield fields
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        dt = time.perf_counter() - t
+        observe(STAGE_HISTOGRAM, dt, stage=stage, status=status, **labels)
+        log_event("span", stage=stage, status=status, ms=round(dt * 1000, 1), **labels, **fields)
+
+# --- ЭКСПОРТ ---
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs: return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]}
+                      for k, v in _histograms.items()}
+    for kind, data in (("counter", counters), ("gauge", gauges)):
+        for name in sorted({n for n, _ in data}):
+            lines.append(f"# TYPE {name} {kind}")
+            for (n, labels), value in data.items():
+                if n == name: lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    for name in sorted({n for n, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), h in histograms.items():
+            if n != name: continue
+            for bound, count in zip(BUCKETS, h["buckets"]):
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', str(bound))])} {count}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {h['count']}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {h['sum']}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404); self.end_headers(); return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port=None):
+    """Поднимает /metrics в фоновом потоке (один раз на процесс). Порт - METRICS_PORT"""
+    global _server
+    port = port or os.environ.get("METRICS_PORT")
+    if _server or not port: return _server
+    with _lock:
+        if _server: return _server
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _Handler)
+        except OSError as e:
+            log.warning(f"metrics endpoint not started on :{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
@@ -0,0 +1,121 @@
+import json
+import zlib
+from dataclasses import dataclass, field
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- МОДЕЛИ ВИКТОРИНЫ ---
+# Слоты вместо __dict__: меньше памяти в session_state, кэшах и очередях.
+# to_json/from_json - обмен (orjson, если установлен),
+# to_bytes/from_bytes - компактная форма для хранения: позиционные массивы + zlib.
+BINARY_MAGIC = b"VQZ1"
+
+class QuizFormatError(ValueError):
+    pass
+
+def _dumps(obj):
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _loads(raw):
+    if orjson:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def _setstate(obj, state):
+    """Распаковка pickle: и слоты, и старые экземпляры с __dict__ (состояние - dict).
+    Без этого session_state/кэши, сохраненные до перехода на слоты, не загружаются"""
+    if isinstance(state, tuple) and len(state) == 2:
+        inst, slots = state
+        state = {**(inst or {}), **(slots or {})}
+    for name in obj.__slots__:
+        if name in state:
+            object.__setattr__(obj, name, state[name])
+
+@dataclass(slots=True)
+class QuizQuestion:
+    scenario: str
+    options: list
+    correct_option_id: int
+    explanation: str = ""
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+        if not hasattr(self, "explanation"): self.explanation = ""
+
+    @classmethod
+    def from_dict(cls, d):
+        """Проверенная сборка из ответа LLM - бросает QuizFormatError"""
+        if not isinstance(d, dict):
+            raise QuizFormatError(f"question must be an object, got {type(d).__name__}")
+        scenario = d.get("scenario")
+        if not isinstance(scenario, str) or not scenario.strip():
+            raise QuizFormatError("question has no scenario")
+        options = d.get("options")
+        if not isinstance(options, list) or len(options) < 2:
+            raise QuizFormatError("question needs at least 2 options")
+        options = [str(o) for o in options]
+        try:
+            correct = int(d.get("correct_option_id"))
+        except (TypeError, ValueError):
+            raise QuizFormatError("correct_option_id is not an integer")
+        if not 0 <= correct < len(options):
+            raise QuizFormatError(f"correct_option_id {correct} out of range")
+        explanation = d.get("explanation") or ""
+        return cls(scenario.strip(), options, correct, str(explanation))
+
+    def to_dict(self):
+        return {"scenario": self.scenario, "options": list(self.options),
+                "correct_option_id": self.correct_option_id, "explanation": self.explanation}
+
+    def to_row(self):
+        return [self.scenario, self.options, self.correct_option_id, self.explanation]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row[0], list(row[1]), row[2], row[3])
+
+@dataclass(slots=True)
+class Quiz:
+    questions: list = field(default_factory=list)
+
+    def __setstate__(self, state):
+        _setstate(self, state)
+
+    @classmethod
+    def from_llm(cls, data):
+        """Викторина из JSON-ответа модели ({"questions": [...]})"""
+        if isinstance(data, (str, bytes)):
+            try:
+                data = _loads(data)
+            except ValueError as e:
+                raise QuizFormatError(f"invalid JSON: {e}")
+        if not isinstance(data, dict) or not isinstance(data.get("questions"), list):
+            raise QuizFormatError("response has no 'questions' list")
+        return cls([QuizQuestion.from_dict(q) for q in data["questions"]])
+
+    def to_dict(self):
+        return {"questions": [q.to_dict() for q in self.questions]}
+
+    def to_json(self):
+        """JSON (bytes, UTF-8)"""
+        return _dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, raw):
+        data = _loads(raw)
+        return cls([QuizQuestion(q["scenario"], list(q["options"]), q["correct_option_id"], q.get("explanation", ""))
+                    for q in data["questions"]])
+
+    def to_bytes(self):
+        return BINARY_MAGIC + zlib.compress(_dumps([q.to_row() for q in self.questions]), 6)
+
+    @classmethod
+    def from_bytes(cls, raw):
+        if raw[:4] != BINARY_MAGIC:
+            raise QuizFormatError("not a packed quiz")
+        return cls([QuizQuestion.from_row(r) for r in _loads(zlib.decompress(raw[4:]))])
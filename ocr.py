@@ -0,0 +1,189 @@
+import os
+import hashlib
+import shutil
+import sqlite3
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+import resilience
+import scratch
+
+# --- OCR ДЛЯ СКАНОВ PDF ---
+# Страницы без текстового слоя (extract_text пустой) растрируются (pypdfium2, иначе pdf2image/poppler)
+# и распознаются tesseract'ом в пуле процессов - по странице на задачу, tesseract однопоточный.
+# Результат кэшируется по хэшу содержимого страницы: повторная загрузка того же скана - без OCR.
+# Весь документ укладывается в OCR_DEADLINE: что не успело - остается пустым.
+OCR_ENABLED = os.environ.get("VYUD_OCR", "1") == "1"
+OCR_LANG = os.environ.get("VYUD_OCR_LANG", "rus+eng")
+OCR_DPI = int(os.environ.get("VYUD_OCR_DPI", "200"))        # 300 - точнее на мелком шрифте, но ~2x медленнее
+OCR_WORKERS = int(os.environ.get("VYUD_OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_DEADLINE = float(os.environ.get("VYUD_OCR_DEADLINE", "120"))
+OCR_MAX_PAGES = 200
+PAGE_TIMEOUT = 60                  # tesseract на одну страницу
+MIN_CHARS = 20                     # меньше - считаем страницу картинкой
+CACHE_DB = os.environ.get("VYUD_OCR_CACHE", "ocr_cache.db")
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    from pdf2image import convert_from_path
+except ImportError:
+    convert_from_path = None
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache_ready = False
+
+def available():
+    if not OCR_ENABLED or pytesseract is None or (pdfium is None and convert_from_path is None): return False
+    return bool(shutil.which(getattr(pytesseract.pytesseract, "tesseract_cmd", "tesseract")) or shutil.which("tesseract"))
+
+def needs_ocr(text):
+    return len((text or "").strip()) < MIN_CHARS
+
+# --- ВОРКЕР (в дочернем процессе) ---
+def _render(path, index, dpi):
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return pdf[index].render(scale=dpi / 72, grayscale=True).to_pil()
+        finally:
+            pdf.close()
+    return convert_from_path(path, dpi=dpi, first_page=index + 1, last_page=index + 1, grayscale=True)[0]
+
+def _ocr_page(path, index, dpi, lang, expires):
+    """expires - time.time() дедлайна документа: страница, взятая после него, не распознается,
+    а tesseract получает таймаут не дальше дедлайна - пул освобождается сам, убивать процессы не нужно"""
+    left = expires - time.time()
+    if left <= 1: return None
+    os.environ["OMP_THREAD_LIMIT"] = "1"   # параллелим страницами, не потоками tesseract
+    image = _render(path, index, dpi)
+    return pytesseract.image_to_string(image, lang=lang, timeout=min(PAGE_TIMEOUT, max(1, expires - time.time())))
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: родитель многопоточный (Streamlit, воркеры jobs) - fork небезопасен
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool(pool):
+    """Сбрасывает пул после BrokenProcessPool - только если это все еще он (другой поток мог уже создать новый)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not pool: return
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+# --- КЭШ ---
+def _cache_conn():
+    global _cache_ready
+    conn = sqlite3.connect(CACHE_DB)
+    if not _cache_ready:
+        conn.execute("CREATE TABLE IF NOT EXISTS ocr_pages (key TEXT PRIMARY KEY, text TEXT)")
+        conn.commit()
+        _cache_ready = True
+    return conn
+
+def page_key(page):
+    """Хэш содержимого страницы PyPDF2 (поток команд + картинки) и настроек OCR"""
+    h = hashlib.sha1(f"{OCR_LANG}|{OCR_DPI}".encode())
+    contents = page.get_contents()
+    if contents is not None: h.update(contents.get_data())
+    try:
+        xobjects = page["/Resources"]["/XObject"].get_object()
+        for name in sorted(xobjects):
+            obj = xobjects[name].get_object()
+            h.update(obj.get_data() if hasattr(obj, "get_data") else repr(obj).encode())
+    except (KeyError, TypeError, AttributeError):
+        pass
+    return h.hexdigest()
+
+def _cache_get(keys):
+    conn = _cache_conn()
+    rows = conn.execute(f"SELECT key, text FROM ocr_pages WHERE key IN ({','.join('?' * len(keys))})", keys).fetchall()
+    conn.close()
+    return dict(rows)
+
+def _cache_put(items):
+    conn = _cache_conn()
+    conn.executemany("INSERT OR REPLACE INTO ocr_pages VALUES (?, ?)", items)
+    conn.commit()
+    conn.close()
+
+# --- ЗАПУСК ---
+def _run(path, todo, deadline):
+    """{индекс: текст} для страниц todo; по дедлайну - что успели"""
+    pool = _get_pool()
+    expires = time.time() + deadline.remaining()
+    futures = {pool.submit(_ocr_page, path, i, OCR_DPI, OCR_LANG, expires): i for i in todo}
+    out, failed, skipped = {}, 0, 0
+    try:
+        for fut in as_completed(futures, timeout=deadline.remaining()):
+            try:
+                text = fut.result()
+                if text is None: skipped += 1
+                else: out[futures[fut]] = text
+            except BrokenProcessPool:
+                # Упал воркер - пул пересоздается, отдаем то, что успели
+                _reset_pool(pool)
+                metrics.inc("vyud_ocr_pages_total", len(todo) - len(out) - failed, result="error")
+                metrics.log_event("ocr_pool_broken", done=len(out), total=len(todo))
+                return out
+            except Exception as e:
+                failed += 1
+                metrics.inc("vyud_ocr_pages_total", result="error")
+                metrics.log_event("ocr_page_failed", page=futures[fut], error=str(e)[:200])
+        if skipped: metrics.inc("vyud_ocr_pages_total", skipped, result="timeout")
+    except FuturesTimeout:
+        # Еще не начатые страницы снимаются; начатые сами укладываются в expires
+        # (таймаут tesseract), поэтому пул не занят страницами этого документа после дедлайна
+        for fut in futures: fut.cancel()
+        metrics.inc("vyud_ocr_pages_total", len(todo) - len(out) - failed, result="timeout")
+        metrics.log_event("ocr_deadline", done=len(out), total=len(todo))
+    return out
+
+def ocr_pages(source, reader, indices):
+    """Текст для страниц indices PDF (source - путь или файловый объект, reader - PyPDF2.PdfReader)"""
+    indices = list(indices)[:OCR_MAX_PAGES]
+    if not indices: return {}
+    keys = {i: page_key(reader.pages[i]) for i in indices}
+    try:
+        cached = _cache_get(list(set(keys.values())))
+    except sqlite3.Error:
+        cached = {}
+    result = {i: cached[k] for i, k in keys.items() if k in cached}
+    todo = [i for i in indices if i not in result]
+    metrics.inc("vyud_cache_requests_total", len(result), cache="ocr", result="hit")
+    metrics.inc("vyud_cache_requests_total", len(todo), cache="ocr", result="miss")
+    if not todo: return result
+
+    deadline = resilience.Deadline(OCR_DEADLINE)
+    with metrics.span("ocr", pages=len(todo)), scratch.job("ocr") as sd:
+        if isinstance(source, str):
+            path = source
+        else:
+            # Дочерним процессам нужен путь: загруженный файл - во временный каталог задачи
+            path = sd.path("input.pdf")
+            source.seek(0)
+            with open(path, "wb") as f: shutil.copyfileobj(source, f)
+        fresh = _run(path, todo, deadline)
+    metrics.inc("vyud_ocr_pages_total", len(fresh), result="ok")
+    result.update(fresh)
+    try:
+        _cache_put([(keys[i], t) for i, t in fresh.items()])
+    except sqlite3.Error as e:
+        metrics.log_event("ocr_cache_error", error=str(e))
+    return result
@@ -0,0 +1,91 @@
+import re
+import zlib
+import numpy as np
+import embeddings
+import metrics
+from models import QuizQuestion, QuizFormatError
+
+# --- КОНТРОЛЬ КАЧЕСТВА ВОПРОСОВ ---
+# После генерации: проверка структуры, чистка дублей вариантов, отсев почти одинаковых вопросов.
+# Похожесть - MinHash по символьным шинглам (numpy, без API); если установлен локальный
+# эмбеддинг - дополнительно косинус по векторам (тоже без сетевых вызовов).
+MIN_OPTIONS = 3
+SHINGLE = 5
+NUM_PERM = 64
+MINHASH_THRESHOLD = 0.6
+EMBED_THRESHOLD = 0.92
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(42)
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+_WORDS = re.compile(r"\w+")
+
+def _norm(s):
+    return " ".join(_WORDS.findall(s.lower()))
+
+def fix_options(q):
+    """Убирает повторы вариантов, пересчитывая correct_option_id"""
+    seen, options, correct = {}, [], None
+    for i, opt in enumerate(q.options):
+        key = _norm(opt)
+        if not key: continue
+        if key not in seen:
+            seen[key] = len(options)
+            options.append(opt.strip())
+        if i == q.correct_option_id:
+            correct = seen[key]
+    if correct is None or len(options) < MIN_OPTIONS:
+        raise QuizFormatError("not enough distinct options")
+    return QuizQuestion(q.scenario, options, correct, q.explanation)
+
+def validate(raw_questions):
+    """Список из ответа LLM -> (валидные QuizQuestion, число отброшенных)"""
+    good, rejected = [], 0
+    for raw in raw_questions if isinstance(raw_questions, list) else []:
+        try:
+            good.append(fix_options(QuizQuestion.from_dict(raw)))
+        except QuizFormatError:
+            rejected += 1
+    return good, rejected
+
+# --- ПОХОЖЕСТЬ ---
+def minhash_signatures(texts):
+    """(len(texts), NUM_PERM) - сигнатуры MinHash по шинглам нормализованного текста"""
+    sigs = np.empty((len(texts), NUM_PERM), dtype=np.uint64)
+    for i, t in enumerate(texts):
+        s = _norm(t)
+        shingles = {s[j:j + SHINGLE] for j in range(max(1, len(s) - SHINGLE + 1))}
+        h = np.fromiter((zlib.crc32(x.encode("utf-8")) for x in shingles), dtype=np.uint64, count=len(shingles))
+        sigs[i] = ((np.outer(_A, h) + _B[:, None]) % _PRIME).min(axis=1)
+    return sigs
+
+def similarity_matrix(texts):
+    sigs = minhash_signatures(texts)
+    sim = (sigs[:, None, :] == sigs[None, :, :]).mean(axis=2)
+    if embeddings.backend() == "local":
+        try:
+            vec = embeddings.embed(texts)
+            sim = np.maximum(sim, np.where(vec @ vec.T >= EMBED_THRESHOLD, 1.0, 0.0))
+        except Exception as e:
+            metrics.log_event("quality_embed_skip", error=str(e))
+    return sim
+
+def drop_duplicates(questions, existing=()):
+    """Оставляет первый из каждой группы почти одинаковых вопросов (и не повторяет existing)"""
+    existing = list(existing)
+    if not questions: return []
+    texts = [q.scenario for q in existing] + [q.scenario for q in questions]
+    sim = similarity_matrix(texts)
+    keep = list(range(len(existing)))
+    for i in range(len(existing), len(texts)):
+        if keep and sim[i, keep].max() >= MINHASH_THRESHOLD: continue
+        keep.append(i)
+    kept = [questions[i - len(existing)] for i in keep if i >= len(existing)]
+    metrics.inc("vyud_quality_dropped_total", len(questions) - len(kept), reason="duplicate")
+    return kept
+
+def clean(raw_questions, existing=()):
+    """Проверка + дедупликация. existing - уже принятые вопросы"""
+    good, rejected = validate(raw_questions)
+    metrics.inc("vyud_quality_dropped_total", rejected, reason="invalid")
+    return drop_duplicates(good, existing)
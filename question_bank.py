@@ -0,0 +1,84 @@
+import random
+import sqlite3
+import secrets
+import time
+import metrics
+import quiz_store
+from models import Quiz, QuizQuestion
+
+# --- БАНК ВОПРОСОВ ---
+# Одна генерация дает пул в BANK_FACTOR раз больше нужного. Пересдачи и разные студенты
+# получают случайную выборку с перемешанными вариантами - локально, без API.
+BANK_FACTOR = 3
+
+_ready = False
+
+def init_db():
+    global _ready
+    if _ready: return
+    conn = sqlite3.connect(quiz_store.DB_FILE)
+    c = conn.cursor()
+    c.execute("""CREATE TABLE IF NOT EXISTS question_banks
+                 (bank_id TEXT PRIMARY KEY, owner TEXT, content_hash TEXT, params TEXT,
+                  title TEXT, hints TEXT, sample_size INTEGER, payload BLOB, created_at REAL)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_banks_content ON question_banks (content_hash, params)")
+    conn.commit()
+    conn.close()
+    _ready = True
+
+def pool_size(num_questions):
+    return num_questions * BANK_FACTOR
+
+def save_bank(owner, chash, params, title, pool, sample_size, hints=""):
+    init_db()
+    conn = sqlite3.connect(quiz_store.DB_FILE)
+    c = conn.cursor()
+    while True:
+        bank_id = secrets.token_urlsafe(6)
+        try:
+            c.execute("INSERT INTO question_banks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                      (bank_id, owner, chash, params, title, hints, sample_size, pool.to_bytes(), time.time()))
+            break
+        except sqlite3.IntegrityError:
+            continue
+    conn.commit()
+    conn.close()
+    return bank_id
+
+def _row_to_dict(row):
+    bank_id, title, hints, sample_size, payload = row
+    return {"bank_id": bank_id, "title": title, "hints": hints, "sample_size": sample_size,
+            "pool": Quiz.from_bytes(payload)}
+
+def load_bank(bank_id):
+    init_db()
+    conn = sqlite3.connect(quiz_store.DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT bank_id, title, hints, sample_size, payload FROM question_banks WHERE bank_id=?", (bank_id,))
+    row = c.fetchone()
+    conn.close()
+    return _row_to_dict(row) if row else None
+
+def find_bank(chash, params):
+    init_db()
+    conn = sqlite3.connect(quiz_store.DB_FILE)
+    c = conn.cursor()
+    c.execute("""SELECT bank_id, title, hints, sample_size, payload FROM question_banks
+                 WHERE content_hash=? AND params=? ORDER BY created_at DESC LIMIT 1""", (chash, params))
+    row = c.fetchone()
+    conn.close()
+    metrics.inc("vyud_cache_requests_total", cache="question_bank", result="hit" if row else "miss")
+    return _row_to_dict(row) if row else None
+
+# --- ВЫБОРКА ---
+def shuffle_options(q, rng):
+    order = list(range(len(q.options)))
+    rng.shuffle(order)
+    return QuizQuestion(q.scenario, [q.options[i] for i in order], order.index(q.correct_option_id), q.explanation)
+
+def sample(pool, n, seed=None):
+    """Случайные n вопросов пула, варианты перемешаны"""
+    rng = random.Random(seed)
+    picked = rng.sample(pool.questions, min(n, len(pool.questions)))
+    metrics.inc("vyud_bank_samples_total")
+    return Quiz([shuffle_options(q, rng) for q in picked])
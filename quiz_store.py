@@ -0,0 +1,90 @@
+import sqlite3
+import hashlib
+import secrets
+import time
+from models import Quiz
+import metrics
+
+DB_FILE = "quizzes.db"
+
+_ready = False
+
+def init_db():
+    global _ready
+    if _ready: return
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("""CREATE TABLE IF NOT EXISTS quizzes
+                 (share_id TEXT PRIMARY KEY, owner TEXT, content_hash TEXT, params TEXT,
+                  title TEXT, hints TEXT, payload BLOB, created_at REAL)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_owner ON quizzes (owner, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_content ON quizzes (content_hash, params)")
+    conn.commit()
+    conn.close()
+    _ready = True
+
+def content_hash(data):
+    """Хэш исходного файла - ключ повторного использования"""
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path, chunk=1 << 20):
+    """То же, что content_hash, но файл читается кусками (большие видео)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""): h.update(block)
+    return h.hexdigest()
+
+def params_key(num_questions, difficulty, language, topic=""):
+    return f"{num_questions}|{difficulty}|{language}|{(topic or '').strip().lower()}"
+
+def _row_to_dict(row):
+    share_id, owner, title, hints, payload = row
+    return {"share_id": share_id, "owner": owner, "title": title, "hints": hints, "quiz": Quiz.from_bytes(payload)}
+
+def save_quiz(owner, chash, params, title, quiz, hints=""):
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    while True:
+        share_id = secrets.token_urlsafe(6)
+        try:
+            c.execute("INSERT INTO quizzes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                      (share_id, owner, chash, params, title, hints, quiz.to_bytes(), time.time()))
+            break
+        except sqlite3.IntegrityError:
+            continue
+    conn.commit()
+    conn.close()
+    return share_id
+
+def load_quiz(share_id):
+    """Викторина по короткому ID или None"""
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT share_id, owner, title, hints, payload FROM quizzes WHERE share_id=?", (share_id,))
+    row = c.fetchone()
+    conn.close()
+    return _row_to_dict(row) if row else None
+
+def find_quiz(chash, params):
+    """Последняя викторина по тому же файлу с теми же настройками"""
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("""SELECT share_id, owner, title, hints, payload FROM quizzes
+                 WHERE content_hash=? AND params=? ORDER BY created_at DESC LIMIT 1""", (chash, params))
+    row = c.fetchone()
+    conn.close()
+    metrics.inc("vyud_cache_requests_total", cache="quiz_store", result="hit" if row else "miss")
+    return _row_to_dict(row) if row else None
+
+def list_quizzes(owner, limit=10):
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("""SELECT share_id, title, created_at FROM quizzes
+                 WHERE owner=? ORDER BY created_at DESC LIMIT ?""", (owner, limit))
+    rows = c.fetchall()
+    conn.close()
+    return [{"share_id": r[0], "title": r[1], "created_at": r[2]} for r in rows]
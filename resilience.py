@@ -0,0 +1,184 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import metrics
+
+# --- УСТОЙЧИВОСТЬ К СБОЯМ ВНЕШНИХ СЕРВИСОВ ---
+# Дедлайны, повторы с экспоненциальной задержкой и джиттером, хеджирование запросов
+# к LLM и circuit breaker, который при падении апстрима сразу отдает ошибку (auth -> SQLite).
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.expired: raise DeadlineExceeded("deadline exceeded")
+
+def is_transient(e):
+    """Таймауты, обрывы, 429 и 5xx - повторяем; 4xx и ошибки формата - нет"""
+    if isinstance(e, (TimeoutError, ConnectionError, DeadlineExceeded)): return True
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None: return status == 429 or status >= 500
+    return type(e).__name__ in ("APITimeoutError", "APIConnectionError", "ReadTimeout", "ConnectTimeout",
+                                "RemoteProtocolError", "ConnectError")
+
+def backoff(attempt, base=0.5, cap=8.0):
+    # "Full jitter": случайно от 0 до base*2^attempt, не больше cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def retry(fn, name, attempts=3, base=0.5, cap=8.0, deadline=None, retry_if=is_transient):
+    for attempt in range(attempts):
+        if deadline: deadline.check()
+        try:
+            return fn()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            last = attempt == attempts - 1
+            if last or not retry_if(e): raise
+            delay = backoff(attempt, base, cap)
+            if deadline and delay >= deadline.remaining(): raise
+            metrics.inc("vyud_retries_total", upstream=name)
+            metrics.log_event("retry", upstream=name, attempt=attempt + 1, delay=round(delay, 2), error=str(e)[:200])
+            time.sleep(delay)
+
+# --- ХЕДЖИРОВАНИЕ ---
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+def hedged(fn, name, hedge_after, timeout=None, on_extra=None):
+    """Если первый запрос не ответил за hedge_after секунд - параллельно шлем второй,
+    берем первый успешный ответ. Хвостовая задержка ограничена, цена - редкий дубль.
+    timeout - на весь вызов с момента старта; fn получает остаток как timeout=.
+    Ответ проигравшего запроса тоже оплачен - он уходит в on_extra(response)"""
+    end = time.monotonic() + timeout if timeout is not None else None
+    left = lambda: None if end is None else max(0.0, end - time.monotonic())
+    run = (lambda: fn(timeout=left())) if end is not None else fn
+    first = _hedge_pool.submit(run)
+    done, _ = wait([first], timeout=hedge_after if end is None else min(hedge_after, left()))
+    if done: return first.result()
+    futures = [first]
+    if end is None or left() > 0:
+        metrics.inc("vyud_hedged_requests_total", upstream=name)
+        futures.append(_hedge_pool.submit(run))
+    pending, winner, error = set(futures), None, None
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=left(), return_when=FIRST_COMPLETED)
+            if not done: raise DeadlineExceeded(f"{name}: no response in {timeout:.0f}s")
+            for f in done:
+                if f.exception() is None:
+                    winner = f
+                    return f.result()
+                error = f.exception()
+        raise error
+    finally:
+        if on_extra:
+            for f in futures:
+                if f is not winner: f.add_done_callback(_extra_callback(on_extra))
+
+def _extra_callback(on_extra):
+    # Колбэк выполняется в потоке пула - контекст (usage.job) переносим явно
+    ctx = contextvars.copy_context()
+    def callback(f):
+        if f.cancelled() or f.exception() is not None: return
+        try:
+            ctx.run(on_extra, f.result())
+        except Exception as e:
+            metrics.log_event("hedge_extra_failed", error=str(e)[:200])
+    return callback
+
+# --- CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """closed -> (failure_threshold ошибок подряд) -> open -> (reset_timeout) -> half_open -> 1 пробный вызов"""
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None: return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout: return "half_open"
+        return "open"
+
+    def _set_gauge(self):
+        metrics.set_gauge("vyud_circuit_open", 0 if self.opened_at is None else 1, upstream=self.name)
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed": return True
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self._set_gauge()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    metrics.log_event("circuit_open", upstream=self.name, failures=self.failures)
+                self.opened_at = time.monotonic()
+            self.probing = False
+            self._set_gauge()
+
+    def call(self, fn):
+        if not self.allow():
+            metrics.inc("vyud_circuit_rejected_total", upstream=self.name)
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn()
+        except Exception as e:
+            if is_transient(e):
+                self.record_failure()
+            else:
+                # 4xx, ошибки postgrest (нарушение ограничения, плохой фильтр), формат ответа -
+                # апстрим отвечает, ошибка в запросе: цепь замыкаем (и снимаем пробный вызов)
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+_breakers = {}
+
+def breaker(name, **kwargs):
+    b = _breakers.get(name)
+    return b if b else _breakers.setdefault(name, CircuitBreaker(name, **kwargs))
+
+def call(fn, name, deadline=None, attempts=3, hedge_after=None, timeout=None, on_extra=None):
+    """Полный стек: breaker -> retry -> (hedge) -> fn. С timeout fn вызывается как fn(timeout=...):
+    на каждую попытку - min(timeout, остаток deadline)"""
+    b = breaker(name)
+    def attempt():
+        t = timeout
+        if t is not None and deadline: t = min(t, deadline.remaining())
+        if hedge_after: return hedged(fn, name, hedge_after, t, on_extra)
+        return fn(timeout=t) if t is not None else fn()
+    return retry(lambda: b.call(attempt), name, attempts=attempts, deadline=deadline)
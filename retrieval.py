@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import numpy as np
+import embeddings
+import metrics
+import textprep
+
+# --- ИНДЕКС ДОКУМЕНТА ---
+# Документ режется на чанки (SentenceSplitter из llama-index-core), чанки эмбеддятся,
+# индекс хранится на диске: INDEX_DIR/<hash>/chunks.json + vectors.npy.
+# Из индекса выбираем либо самые представительные и разнообразные чанки (MMR к центроиду),
+# либо ближайшие к теме ("тест по теме X"), и собираем из них контекст в бюджет токенов.
+INDEX_DIR = os.environ.get("VYUD_INDEX_DIR", ".vyud_index")
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 64
+MMR_LAMBDA = 0.6  # 1.0 - только релевантность, 0.0 - только разнообразие
+
+def doc_hash(text):
+    # Модель эмбеддингов входит в ключ: векторы разных бэкендов несовместимы
+    return hashlib.sha256((embeddings.model_id() + "\0" + text).encode("utf-8")).hexdigest()[:32]
+
+def split_chunks(text):
+    try:
+        from llama_index.core.node_parser import SentenceSplitter
+        splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        return [c for c in splitter.split_text(text) if c.strip()]
+    except ImportError:
+        # Без llama-index - по абзацам, склеивая до ~CHUNK_SIZE токенов
+        chunks, cur = [], ""
+        for para in text.split("\n\n"):
+            if cur and textprep.count_tokens(cur + para) > CHUNK_SIZE:
+                chunks.append(cur.strip()); cur = ""
+            cur += para + "\n\n"
+        if cur.strip(): chunks.append(cur.strip())
+        return chunks
+
+class DocIndex:
+    def __init__(self, doc_id, chunks, vectors):
+        self.doc_id = doc_id
+        self.chunks = chunks
+        self.vectors = vectors
+
+    @property
+    def path(self):
+        return os.path.join(INDEX_DIR, self.doc_id)
+
+    @classmethod
+    def build(cls, text, doc_id=None):
+        doc_id = doc_id or doc_hash(text)
+        with metrics.span("index_build") as sp:
+            chunks = split_chunks(text)
+            vectors = embeddings.embed(chunks)
+            sp["chunks"] = len(chunks)
+        return cls(doc_id, chunks, vectors)
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(self.chunks, f, ensure_ascii=False)
+        np.save(os.path.join(self.path, "vectors.npy"), self.vectors)
+
+    @classmethod
+    def load(cls, doc_id):
+        path = os.path.join(INDEX_DIR, doc_id)
+        try:
+            with open(os.path.join(path, "chunks.json"), encoding="utf-8") as f:
+                chunks = json.load(f)
+            vectors = np.load(os.path.join(path, "vectors.npy"))
+        except (OSError, ValueError):
+            return None
+        return cls(doc_id, chunks, vectors)
+
+    # --- ВЫБОР ЧАНКОВ ---
+    def mmr(self, target, k, lambda_=MMR_LAMBDA):
+        """Maximal Marginal Relevance: близко к target, но не похоже на уже выбранные"""
+        k = min(k, len(self.chunks))
+        if not k: return []
+        relevance = self.vectors @ target
+        sim = self.vectors @ self.vectors.T
+        selected = [int(np.argmax(relevance))]
+        max_sim = sim[selected[0]].copy()
+        for _ in range(k - 1):
+            score = lambda_ * relevance - (1 - lambda_) * max_sim
+            score[selected] = -np.inf
+            nxt = int(np.argmax(score))
+            selected.append(nxt)
+            np.maximum(max_sim, sim[nxt], out=max_sim)
+        return selected
+
+    def representative(self, k):
+        centroid = self.vectors.mean(axis=0)
+        norm = np.linalg.norm(centroid)
+        return self.mmr(centroid / norm if norm else centroid, k)
+
+    def query(self, topic, k):
+        return self.mmr(embeddings.embed([topic])[0], k)
+
+    def context(self, ids, budget):
+        """Чанки в порядке документа, пока помещаются в бюджет токенов"""
+        picked, used = [], 0
+        for i in ids:
+            n = textprep.count_tokens(self.chunks[i])
+            if used + n > budget: continue
+            picked.append(i); used += n
+        return "\n\n".join(self.chunks[i] for i in sorted(picked))
+
+def get_index(text):
+    """Индекс с диска или новый (и сразу сохраненный)"""
+    doc_id = doc_hash(text)
+    idx = DocIndex.load(doc_id)
+    metrics.inc("vyud_cache_requests_total", cache="doc_index", result="hit" if idx else "miss")
+    if idx is None:
+        idx = DocIndex.build(text, doc_id)
+        idx.save()
+    return idx
+
+def select_context(text, budget, topic=None):
+    """Контекст для генерации: по теме или самые представительные/разнообразные части"""
+    idx = get_index(text)
+    k = max(1, budget // max(1, CHUNK_SIZE // 2))
+    ids = idx.query(topic, k) if topic else idx.representative(k)
+    return idx.context(ids, budget)
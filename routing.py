@@ -0,0 +1,65 @@
+import os
+import threading
+import tomllib
+from dataclasses import dataclass
+import metrics
+
+# --- МАРШРУТИЗАЦИЯ МОДЕЛЕЙ ---
+# Модель выбирается по задаче, размеру входа и сложности (routing.toml).
+# По каждому маршруту копится статистика задержки и стоимости - для админки и /metrics.
+CONFIG_PATH = os.environ.get("VYUD_ROUTING_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing.toml"))
+DEFAULT_CONFIG = {"default_model": "gpt-4o", "routes": []}
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    name: str
+    model: str
+
+_config = None
+_stats = {}
+_lock = threading.Lock()
+
+def load_config(path=None):
+    global _config
+    try:
+        with open(path or CONFIG_PATH, "rb") as f:
+            _config = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        metrics.log_event("routing_config_default", error=str(e))
+        _config = DEFAULT_CONFIG
+    return _config
+
+def _matches(rule, task, input_tokens, difficulty):
+    tasks = rule.get("task")
+    if tasks and task not in ([tasks] if isinstance(tasks, str) else tasks): return False
+    levels = rule.get("difficulty")
+    if levels and (difficulty or "").lower() not in [d.lower() for d in levels]: return False
+    if "max_input_tokens" in rule and input_tokens > rule["max_input_tokens"]: return False
+    if "min_input_tokens" in rule and input_tokens < rule["min_input_tokens"]: return False
+    return True
+
+def route(task, input_tokens=0, difficulty=None):
+    config = _config or load_config()
+    for rule in config.get("routes", []):
+        if _matches(rule, task, input_tokens, difficulty):
+            return Route(rule.get("name", task), rule["model"])
+    return Route("default", config.get("default_model", DEFAULT_CONFIG["default_model"]))
+
+# --- СТАТИСТИКА ---
+def record(r, latency, cost_usd):
+    metrics.inc("vyud_route_requests_total", route=r.name, model=r.model)
+    metrics.inc("vyud_route_cost_usd_total", cost_usd, route=r.name, model=r.model)
+    metrics.observe("vyud_route_latency_seconds", latency, route=r.name, model=r.model)
+    with _lock:
+        s = _stats.setdefault(r, {"requests": 0, "latency_sum": 0.0, "latency_max": 0.0, "cost_usd": 0.0})
+        s["requests"] += 1
+        s["latency_sum"] += latency
+        s["latency_max"] = max(s["latency_max"], latency)
+        s["cost_usd"] += cost_usd
+
+def stats():
+    with _lock:
+        return [{"route": r.name, "model": r.model, "requests": s["requests"],
+                 "avg_latency_s": round(s["latency_sum"] / s["requests"], 2),
+                 "max_latency_s": round(s["latency_max"], 2), "cost_usd": round(s["cost_usd"], 4)}
+                for r, s in _stats.items()]
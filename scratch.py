@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import metrics
+
+# --- ВРЕМЕННЫЕ ФАЙЛЫ ---
+# Каждая задача получает свой каталог в SCRATCH_ROOT (можно tmpfs: VYUD_SCRATCH_DIR=/dev/shm/vyud)
+# и квоту на него. Каталог удаляется при выходе из with - при любой ошибке тоже.
+# Каталоги от упавших процессов (pid не жив или старше ORPHAN_AGE) удаляет sweep() при старте.
+SCRATCH_ROOT = os.environ.get("VYUD_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "vyud_scratch"))
+JOB_QUOTA_MB = int(os.environ.get("VYUD_SCRATCH_JOB_MB", "1024"))
+MIN_FREE_MB = int(os.environ.get("VYUD_SCRATCH_MIN_FREE_MB", "512"))   # не занимать диск до конца
+ORPHAN_AGE = 6 * 3600
+
+class ScratchQuotaError(OSError):
+    pass
+
+_lock = threading.Lock()
+_active = {}
+_swept = False
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try: total += os.path.getsize(os.path.join(root, name))
+            except OSError: pass
+    return total
+
+def report():
+    """Гауги занятого/свободного места и числа активных задач"""
+    with _lock:
+        active = len(_active)
+        reserved = sum(_active.values())
+    metrics.set_gauge("vyud_scratch_jobs", active)
+    metrics.set_gauge("vyud_scratch_reserved_bytes", reserved)
+    try:
+        du = shutil.disk_usage(SCRATCH_ROOT)
+        metrics.set_gauge("vyud_scratch_free_bytes", du.free)
+        metrics.set_gauge("vyud_scratch_used_bytes", _dir_size(SCRATCH_ROOT))
+    except OSError:
+        pass
+
+def sweep(max_age=ORPHAN_AGE):
+    """Удаляет каталоги умерших процессов и слишком старые; возвращает число удаленных"""
+    global _swept
+    _swept = True
+    os.makedirs(SCRATCH_ROOT, exist_ok=True)
+    removed = 0
+    now = time.time()
+    for name in os.listdir(SCRATCH_ROOT):
+        path = os.path.join(SCRATCH_ROOT, name)
+        parts = name.rsplit("-", 2)   # <prefix>-<pid>-<id>
+        pid = parts[1] if len(parts) == 3 else ""
+        try:
+            stale = now - os.path.getmtime(path) > max_age
+        except OSError:
+            continue
+        dead = pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid))
+        if path in _active or not (stale or dead): continue
+        if os.path.isdir(path): shutil.rmtree(path, ignore_errors=True)
+        else:
+            try: os.remove(path)
+            except OSError: pass
+        removed += 1
+    metrics.inc("vyud_scratch_orphans_removed_total", removed)
+    if removed: metrics.log_event("scratch_sweep", removed=removed, root=SCRATCH_ROOT)
+    report()
+    return removed
+
+class ScratchDir:
+    def __init__(self, path, quota):
+        self.root = path
+        self.quota = quota
+        self.reserved = 0
+
+    def path(self, name):
+        """Путь внутри каталога задачи (только имя файла, без подкаталогов снаружи)"""
+        return os.path.join(self.root, os.path.basename(name))
+
+    def usage(self):
+        return _dir_size(self.root)
+
+    def reserve(self, nbytes):
+        """Перед записью файла известного размера: квота задачи и свободное место на томе"""
+        if self.reserved + nbytes > self.quota:
+            metrics.inc("vyud_scratch_quota_rejected_total", reason="job_quota")
+            raise ScratchQuotaError(f"scratch quota exceeded: {(self.reserved + nbytes) >> 20} MB > {self.quota >> 20} MB")
+        with _lock:
+            pending = sum(_active.values())
+            free = shutil.disk_usage(SCRATCH_ROOT).free - pending
+            if free - nbytes < MIN_FREE_MB * 1024 * 1024:
+                metrics.inc("vyud_scratch_quota_rejected_total", reason="disk_full")
+                raise ScratchQuotaError("not enough free space in scratch")
+            self.reserved += nbytes
+            _active[self.root] = self.reserved
+
+    def check(self):
+        """После записи файлов неизвестного размера (ffmpeg): фактический объем в пределах квоты"""
+        if self.usage() > self.quota:
+            metrics.inc("vyud_scratch_quota_rejected_total", reason="job_quota")
+            raise ScratchQuotaError("scratch quota exceeded")
+
+@contextmanager
+def job(prefix="job", reserve=0, quota_mb=None):
+    """with scratch.job("bot", reserve=size) as sd: path = sd.path("input.mp4") - каталог удаляется всегда"""
+    if not _swept: sweep()
+    path = os.path.join(SCRATCH_ROOT, f"{prefix}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(path)
+    sd = ScratchDir(path, (quota_mb or JOB_QUOTA_MB) * 1024 * 1024)
+    with _lock: _active[path] = 0
+    try:
+        if reserve: sd.reserve(reserve)
+        yield sd
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        with _lock: _active.pop(path, None)
+        metrics.inc("vyud_scratch_reserved_bytes_total", sd.reserved, prefix=prefix)
+        report()
@@ -0,0 +1,90 @@
+import os
+import threading
+import metrics
+import usage
+
+# --- РАСПОЗНАВАНИЕ РЕЧИ ---
+# Бэкенды: "openai" (Whisper API) или "local" (faster-whisper на CPU, int8, без сети).
+# "auto" - короткие записи (кружки, голосовые) локально, если faster-whisper установлен,
+# длинные - в API. Ошибка локального движка - откат на API.
+STT_BACKEND = os.environ.get("VYUD_STT_BACKEND", "auto")
+API_MODEL = "whisper-1"
+API_MAX_MB = 24
+LOCAL_MODEL = os.environ.get("VYUD_STT_LOCAL_MODEL", "small")
+LOCAL_THREADS = int(os.environ.get("VYUD_STT_THREADS", str(os.cpu_count() or 1)))
+LOCAL_WORKERS = int(os.environ.get("VYUD_STT_WORKERS", "1"))   # параллельные распознавания на модель
+LOCAL_BATCH_SIZE = 8               # сегменты, декодируемые одним батчем
+LOCAL_MAX_SECONDS = float(os.environ.get("VYUD_STT_LOCAL_MAX_SECONDS", "180"))
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:
+    BatchedInferencePipeline = None
+
+_local_model = None
+_local_lock = threading.Lock()
+
+def local_available():
+    return WhisperModel is not None
+
+def backend_for(seconds):
+    if STT_BACKEND == "auto":
+        return "local" if local_available() and seconds <= LOCAL_MAX_SECONDS else "openai"
+    return STT_BACKEND
+
+# --- БЭКЕНДЫ ---
+def _transcribe_openai(audio_path, seconds, client):
+    from logic import whisper_request
+    size_mb = os.path.getsize(audio_path) / (1024 * 1024)
+    if size_mb > API_MAX_MB:
+        raise ValueError("File too large")
+    with metrics.span("whisper", backend="openai"):
+        text = whisper_request(client, audio_path, API_MODEL)
+    usage.record_audio(API_MODEL, seconds)
+    return text
+
+def _get_local_model():
+    global _local_model
+    with _local_lock:
+        if _local_model is None:
+            if WhisperModel is None:
+                raise RuntimeError("Локальное распознавание недоступно: pip install faster-whisper")
+            with metrics.span("stt_model_load", model=LOCAL_MODEL):
+                model = WhisperModel(LOCAL_MODEL, device="cpu", compute_type="int8",
+                                     cpu_threads=LOCAL_THREADS, num_workers=LOCAL_WORKERS)
+            _local_model = BatchedInferencePipeline(model=model) if BatchedInferencePipeline else model
+    return _local_model
+
+def _transcribe_local(audio_path, seconds, client=None):
+    model = _get_local_model()
+    with metrics.span("whisper", backend="local", model=LOCAL_MODEL):
+        if BatchedInferencePipeline is not None and isinstance(model, BatchedInferencePipeline):
+            segments, _ = model.transcribe(audio_path, batch_size=LOCAL_BATCH_SIZE)
+        else:
+            segments, _ = model.transcribe(audio_path, beam_size=1, vad_filter=True)
+        # segments - генератор: распознавание идет по мере чтения
+        text = " ".join(s.text.strip() for s in segments)
+    metrics.inc("vyud_stt_local_seconds_total", seconds)
+    return text
+
+BACKENDS = {"openai": _transcribe_openai, "local": _transcribe_local}
+
+def transcribe(audio_path, seconds, client=None):
+    """Аудио (уже подготовленное media.prepare_audio) -> текст. client нужен только для openai"""
+    name = backend_for(seconds)
+    metrics.inc("vyud_stt_requests_total", backend=name)
+    if name == "local" and STT_BACKEND == "auto":
+        try:
+            return _transcribe_local(audio_path, seconds)
+        except Exception as e:
+            metrics.log_event("stt_local_fallback", error=str(e)[:200])
+            name = "openai"
+    if name == "openai" and client is None:
+        from logic import get_client, get_api_key, WHISPER_TIMEOUT
+        client = get_client(get_api_key(), WHISPER_TIMEOUT)
+    return BACKENDS[name](audio_path, seconds, client)
@@ -0,0 +1,73 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+pytest.importorskip("openai")
+logic = pytest.importorskip("logic")   # streamlit, PyPDF2, reportlab
+import batch
+import fake_openai
+import usage
+
+class Killed(Exception):
+    pass
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    server, url = fake_openai.start_server(latency=0, jitter=0)
+    monkeypatch.setenv("OPENAI_BASE_URL", url)
+    monkeypatch.setattr(usage, "DB_FILE", str(tmp_path / "users.db"))
+    monkeypatch.setattr(usage, "_ready", False)
+    fake_openai._files.clear()
+    fake_openai._batches.clear()
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(3):
+        (docs / f"doc{i}.txt").write_text(fake_openai_text(i), encoding="utf-8")
+    yield tmp_path / "work", docs, logic.get_client("sk-test")
+    server.shutdown()
+
+def fake_openai_text(i):
+    return f"Документ {i}. " + "Охрана труда - система мероприятий по сохранению жизни и здоровья работников. " * 20
+
+def test_submit_poll_collect(env):
+    work, docs, client = env
+    batch.build_requests(str(work), [str(docs)], num_questions=3)
+    batch.submit(str(work), client)
+    batch.poll(str(work), client, interval=0)
+    state = batch.collect(str(work), client)
+    assert {d["status"] for d in state["docs"].values()} == {"done"}
+    assert len(batch.load_quizzes(str(work))) == 3
+    # Повторный collect ничего не пересчитывает
+    assert batch.collect(str(work), client)["docs"] == state["docs"]
+
+def test_resume_after_crash_does_not_resubmit(env, monkeypatch):
+    work, docs, client = env
+    batch.build_requests(str(work), [str(docs)], num_questions=3)
+    create = client.batches.create
+
+    def create_then_die(**kwargs):
+        create(**kwargs)
+        raise Killed()
+
+    monkeypatch.setattr(client.batches, "create", create_then_die)
+    with pytest.raises(Killed):
+        batch.submit(str(work), client)
+    monkeypatch.setattr(client.batches, "create", create)
+    state = batch.submit(str(work), client)
+    assert len(fake_openai._batches) == 1
+    assert list(state["batches"]) == list(fake_openai._batches)
+
+def test_new_documents_go_to_next_batch(env):
+    work, docs, client = env
+    batch.build_requests(str(work), [str(docs)], num_questions=3)
+    batch.submit(str(work), client)
+    (docs / "late.txt").write_text(fake_openai_text(9), encoding="utf-8")
+    batch.build_requests(str(work), [str(docs)], num_questions=3)
+    state = batch.submit(str(work), client)
+    assert len(state["batches"]) == 2
+    batch.poll(str(work), client, interval=0)
+    state = batch.collect(str(work), client)
+    assert len(state["docs"]) == 4 and {d["status"] for d in state["docs"].values()} == {"done"}
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import sys
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+auth = pytest.importorskip("auth")
+import usage
+
+EMAIL = "user@example.com"
+
+@pytest.fixture(autouse=True)
+def sqlite_only(tmp_path, monkeypatch):
+    # Только SQLite-ветка: Supabase отключен, базы - во временном каталоге
+    db = str(tmp_path / "users.db")
+    monkeypatch.setattr(auth, "DB_FILE", db)
+    monkeypatch.setattr(usage, "DB_FILE", db)
+    monkeypatch.setattr(usage, "_ready", False)
+    monkeypatch.setattr(auth, "get_supabase", lambda: None)
+    auth.register_user(EMAIL, "secret")
+
+def _spend(job_id, completion_tokens):
+    # gpt-4o: 10 USD за 1M выходных токенов; 5000 токенов = 0.05 USD = 1 кредит
+    with usage.job(EMAIL, job_id):
+        usage.record_llm("gpt-4o", "quiz", SimpleNamespace(prompt_tokens=0, completion_tokens=completion_tokens))
+
+def _set_balance(credits):
+    conn = sqlite3.connect(auth.DB_FILE)
+    conn.execute("UPDATE users_credits SET credits=? WHERE email=?", (credits, EMAIL))
+    conn.commit()
+    conn.close()
+
+def test_charge_by_actual_cost():
+    _spend("job-1", 15000)
+    assert auth.deduct_credit(EMAIL, job_id="job-1") == 3
+    assert auth.get_user_credits(EMAIL) == 2
+
+def test_repeated_charge_for_same_job_is_idempotent():
+    _spend("job-1", 10000)
+    assert auth.deduct_credit(EMAIL, job_id="job-1") == 2
+    assert auth.deduct_credit(EMAIL, job_id="job-1") == 2
+    assert auth.get_user_credits(EMAIL) == 3
+    assert usage.job_charge("job-1") == 2
+
+def test_charge_is_clamped_to_balance():
+    _set_balance(1)
+    _spend("job-1", 50000)
+    assert auth.deduct_credit(EMAIL, job_id="job-1") == 1
+    assert auth.get_user_credits(EMAIL) == 0
+    _spend("job-2", 5000)
+    assert auth.deduct_credit(EMAIL, job_id="job-2") == 0
+    assert auth.get_user_credits(EMAIL) == 0
+
+def test_plain_deduct_never_goes_negative():
+    assert auth.deduct_credit(EMAIL, 7) == 5
+    assert auth.get_user_credits(EMAIL) == 0
+
+def test_failed_deduct_releases_ledger_entry(monkeypatch):
+    _spend("job-1", 5000)
+    monkeypatch.setattr(auth, "_deduct", lambda email, amount: False)
+    assert auth.deduct_credit(EMAIL, job_id="job-1") is None
+    assert usage.job_charge("job-1") is None
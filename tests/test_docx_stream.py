@@ -0,0 +1,40 @@
+import io
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import docx_stream
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+def _p(text):
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+def _table(rows):
+    return "<w:tbl>" + "".join("<w:tr>" + "".join(f"<w:tc>{_p(c)}</w:tc>" for c in row) + "</w:tr>"
+                               for row in rows) + "</w:tbl>"
+
+def _docx(body, header="Колонтитул"):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("word/document.xml", f"<w:document {NS}><w:body>{body}</w:body></w:document>")
+        for name in ("word/header1.xml", "word/header2.xml", "word/footer1.xml"):
+            z.writestr(name, f"<w:hdr {NS}>{_p(header)}</w:hdr>")
+    buf.seek(0)
+    return buf
+
+def test_blocks_in_document_order_with_tables():
+    body = _p("Введение") + _table([["Термин", "Определение"], ["API", "интерфейс"]]) + _p("Заключение")
+    assert list(docx_stream.iter_blocks(_docx(body))) == [
+        "Введение", "Термин | Определение", "API | интерфейс", "Заключение", "Колонтитул"]
+
+def test_nested_table_becomes_cell_text():
+    body = _table([["Внешняя", _table([["a", "b"]])]])
+    assert list(docx_stream.iter_blocks(_docx(body, header=""))) == ["Внешняя | a | b"]
+
+def test_read_text_stops_at_token_budget():
+    body = "".join(_p(f"Абзац номер {i} с некоторым текстом") for i in range(200))
+    text = docx_stream.read_text(_docx(body), max_tokens=50)
+    assert text.startswith("Абзац номер 0")
+    assert 0 < len(text.splitlines()) < 200
@@ -0,0 +1,33 @@
+import io
+import json
+import os
+import re
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import export
+from models import Quiz, QuizQuestion
+
+HOSTILE = "</script><script>alert(1)</script><!-- & \u2028\u2029"
+
+def test_safe_json_cannot_close_script():
+    s = export._safe_json({"q": HOSTILE})
+    for bad in ("<", ">", "&", "\u2028", "\u2029"):
+        assert bad not in s
+    assert json.loads(s) == {"q": HOSTILE}
+
+def test_html_export_embeds_escaped_data():
+    quiz = Quiz([QuizQuestion(HOSTILE, ["<b>a</b>", "b & c"], 1)])
+    html = export.quiz_html(quiz, "<Тест>").decode("utf-8")
+    # В документе ровно один <script> и один </script> - из шаблона
+    assert html.count("<script") == 1 and html.count("</script>") == 1
+    assert "<Тест>" not in html
+    data = re.search(r"const d=(.*?);", html).group(1)
+    assert json.loads(data)[0] == {"question": HOSTILE, "options": ["<b>a</b>", "b & c"], "correct": 1}
+
+def test_scorm_package_contains_manifest_and_page():
+    quiz = Quiz([QuizQuestion("S", ["a", "b"], 0)])
+    with zipfile.ZipFile(io.BytesIO(export.scorm_package(quiz, "T"))) as zf:
+        assert set(zf.namelist()) == {"imsmanifest.xml", "index.html"}
+        assert b"const d=" in zf.read("index.html")
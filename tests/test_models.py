@@ -0,0 +1,39 @@
+import io
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import models
+
+class QuizQuestion:
+    """Старая модель из logic.py - обычный класс с __dict__"""
+    def __init__(self, scenario, options, correct_option_id, explanation=""):
+        self.scenario = scenario
+        self.options = options
+        self.correct_option_id = correct_option_id
+        self.explanation = explanation
+
+class Quiz:
+    def __init__(self, questions):
+        self.questions = questions
+
+class _Loader(pickle.Unpickler):
+    """Старые классы этого модуля -> новые из models, как после обновления кода"""
+    def find_class(self, module, name):
+        if module == __name__:
+            return getattr(models, name)
+        return super().find_class(module, name)
+
+def test_old_dict_pickle_loads_into_slots():
+    raw = pickle.dumps(Quiz([QuizQuestion("Что такое X?", ["a", "b", "c"], 1, "Потому что")]))
+    quiz = _Loader(io.BytesIO(raw)).load()
+    assert isinstance(quiz, models.Quiz)
+    q = quiz.questions[0]
+    assert isinstance(q, models.QuizQuestion)
+    assert (q.scenario, q.options, q.correct_option_id, q.explanation) == ("Что такое X?", ["a", "b", "c"], 1, "Потому что")
+
+def test_slots_pickle_roundtrip():
+    quiz = models.Quiz([models.QuizQuestion("S", ["a", "b"], 0, "E")])
+    assert pickle.loads(pickle.dumps(quiz)) == quiz
+    assert models.Quiz.from_bytes(quiz.to_bytes()) == quiz
@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("numpy")
+import embeddings
+import quality
+from models import QuizQuestion, QuizFormatError
+
+@pytest.fixture(autouse=True)
+def minhash_only(monkeypatch):
+    # Только MinHash: без локальной модели эмбеддингов результат детерминирован
+    monkeypatch.setattr(embeddings, "backend", lambda: "openai")
+
+def test_fix_options_merges_duplicates_and_remaps_correct():
+    q = quality.fix_options(QuizQuestion("S", ["Paris", "paris.", "London", "  ", "Rome"], 1))
+    assert q.options == ["Paris", "London", "Rome"]
+    assert q.correct_option_id == 0
+
+def test_fix_options_rejects_too_few_distinct():
+    with pytest.raises(QuizFormatError):
+        quality.fix_options(QuizQuestion("S", ["A", "a", "B"], 2))
+
+def test_clean_drops_invalid_and_near_duplicates():
+    raw = [
+        {"scenario": "Какая столица у Франции согласно тексту?", "options": ["Париж", "Лион", "Ницца"], "correct_option_id": 0},
+        {"scenario": "Какая столица у Франции, согласно тексту?", "options": ["Лион", "Париж", "Ницца"], "correct_option_id": 1},
+        {"scenario": "Сколько лет длилась Столетняя война?", "options": ["100", "116", "99"], "correct_option_id": 1},
+        {"scenario": "", "options": ["a", "b", "c"], "correct_option_id": 0},
+    ]
+    kept = quality.clean(raw)
+    assert [q.scenario for q in kept] == [raw[0]["scenario"], raw[2]["scenario"]]
+
+def test_drop_duplicates_respects_existing():
+    existing = [QuizQuestion("Сколько лет длилась Столетняя война?", ["100", "116", "99"], 1)]
+    new = [QuizQuestion("Сколько лет длилась Столетняя война", ["116", "100", "99"], 0),
+           QuizQuestion("Кто написал «Войну и мир»?", ["Толстой", "Чехов", "Гоголь"], 0)]
+    assert quality.drop_duplicates(new, existing) == [new[1]]
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import question_bank
+from models import Quiz, QuizQuestion
+
+POOL = Quiz([QuizQuestion(f"Вопрос {i}", [f"верно {i}", f"неверно {i}.1", f"неверно {i}.2", f"неверно {i}.3"], 0)
+             for i in range(15)])
+
+def test_same_seed_gives_same_quiz():
+    assert question_bank.sample(POOL, 5, seed="share-link") == question_bank.sample(POOL, 5, seed="share-link")
+    assert question_bank.sample(POOL, 5, seed="a") != question_bank.sample(POOL, 5, seed="b")
+
+def test_sample_keeps_correct_answer_after_shuffle():
+    quiz = question_bank.sample(POOL, 5, seed=1)
+    assert len({q.scenario for q in quiz.questions}) == 5
+    for q in quiz.questions:
+        assert q.options[q.correct_option_id].startswith("верно")
+        assert sorted(q.options) == sorted(next(p.options for p in POOL.questions if p.scenario == q.scenario))
+
+def test_sample_larger_than_pool_returns_whole_pool():
+    assert len(question_bank.sample(POOL, 50, seed=0).questions) == len(POOL.questions)
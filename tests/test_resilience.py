@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import resilience
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def _raise(status):
+    def fn():
+        raise HTTPError(status)
+    return fn
+
+def test_half_open_probe_with_client_error_closes_breaker():
+    b = resilience.CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    with pytest.raises(HTTPError):
+        b.call(_raise(503))
+    assert b.state == "half_open"
+    # Пробный вызов падает с 400 - апстрим жив, цепь не должна застрять в probing
+    with pytest.raises(HTTPError):
+        b.call(_raise(400))
+    assert b.state == "closed" and not b.probing
+    assert b.call(lambda: "ok") == "ok"
+
+def test_half_open_probe_with_server_error_reopens():
+    b = resilience.CircuitBreaker("test2", failure_threshold=1, reset_timeout=60.0)
+    with pytest.raises(HTTPError):
+        b.call(_raise(503))
+    with pytest.raises(resilience.CircuitOpenError):
+        b.call(lambda: "ok")
+
+def test_hedged_call_respects_deadline():
+    calls, extra = [], []
+    def slow(timeout):
+        # Как SDK: не уложился в timeout - TimeoutError
+        calls.append(timeout)
+        time.sleep(min(timeout, 0.5))
+        if timeout < 0.5: raise TimeoutError("request timed out")
+        return "late"
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        resilience.call(slow, "test3", deadline=resilience.Deadline(0.3), hedge_after=0.1, timeout=90,
+                        on_extra=extra.append)
+    assert time.monotonic() - started < 0.6
+    assert len(calls) == 2 and all(t <= 0.3 for t in calls)
+
+def test_hedged_loser_reported():
+    extra = []
+    responses = iter([0.3, 0.0])
+    def staggered(timeout):
+        time.sleep(next(responses))
+        return "ok"
+    assert resilience.hedged(staggered, "test4", 0.1, timeout=5, on_extra=extra.append) == "ok"
+    time.sleep(0.4)
+    assert extra == ["ok"]
+
+class APIError(Exception):
+    """Как postgrest.APIError: код ошибки БД, без status_code"""
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+def _throw(exc):
+    def fn():
+        raise exc
+    return fn
+
+def test_non_transient_errors_without_status_do_not_open_breaker():
+    b = resilience.CircuitBreaker("test5", failure_threshold=2, reset_timeout=60.0)
+    for _ in range(5):
+        with pytest.raises(APIError):
+            b.call(_throw(APIError("23505")))
+    assert b.state == "closed"
+    with pytest.raises(ConnectionError):
+        b.call(_throw(ConnectionError()))
+    with pytest.raises(ConnectionError):
+        b.call(_throw(ConnectionError()))
+    assert b.state == "open"
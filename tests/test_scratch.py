@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch
+
+@pytest.fixture(autouse=True)
+def scratch_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(scratch, "SCRATCH_ROOT", str(tmp_path))
+    monkeypatch.setattr(scratch, "MIN_FREE_MB", 0)
+    monkeypatch.setattr(scratch, "_swept", True)
+    return tmp_path
+
+def test_reserve_over_quota_is_rejected_and_dir_removed():
+    with pytest.raises(scratch.ScratchQuotaError):
+        with scratch.job("t", quota_mb=1) as sd:
+            root = sd.root
+            sd.reserve(512 * 1024)
+            sd.reserve(600 * 1024)
+    assert not os.path.exists(root)
+    assert scratch._active == {}
+
+def test_check_catches_unreserved_writes():
+    with scratch.job("t", quota_mb=1) as sd:
+        with open(sd.path("out.wav"), "wb") as f: f.write(b"\0" * (2 * 1024 * 1024))
+        with pytest.raises(scratch.ScratchQuotaError):
+            sd.check()
+
+def test_path_stays_inside_job_dir():
+    with scratch.job("t") as sd:
+        assert os.path.dirname(sd.path("../../etc/passwd")) == sd.root
+
+def test_sweep_removes_dead_and_stale_dirs(scratch_root):
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    dead = scratch_root / f"bot-{proc.pid}-deadbeef"
+    stale = scratch_root / f"app-{os.getpid()}-0ld0ld00"
+    live = scratch_root / f"app-{os.getpid()}-11ve11ve"
+    for d in (dead, stale, live): d.mkdir()
+    old = time.time() - scratch.ORPHAN_AGE - 60
+    os.utime(stale, (old, old))
+    with scratch.job("t") as sd:
+        assert scratch.sweep() == 2
+        assert os.path.isdir(sd.root)
+    assert sorted(os.listdir(scratch_root)) == [live.name]
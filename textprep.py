@@ -0,0 +1,143 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# --- НОРМАЛИЗАЦИЯ ТЕКСТА ПЕРЕД LLM ---
+# Страницы PDF разделяются "\f" (см. logic.extract_document_text):
+# по ним ищем колонтитулы, которые повторяются на многих страницах.
+PAGE_BREAK = "\f"
+MIN_PAGES_FOR_BOILERPLATE = 3
+BOILERPLATE_PAGE_SHARE = 0.5
+MIN_DUP_PARAGRAPH = 40
+EDGE_LINES = 3
+MAX_BOILERPLATE_LINE = 100
+CHARS_PER_TOKEN_FALLBACK = 3  # без tiktoken считаем с запасом (кириллица ~2.5-3 симв./токен)
+
+_PAGE_NUMBER = re.compile(r"^\s*(?:page|стр\.?|страница|с\.)?\s*[-–—]?\s*\d{1,4}\s*[-–—]?\s*(?:(?:of|из|/)\s*\d{1,4})?\s*$", re.I)
+_HYPHEN_BREAK = re.compile(r"(\w+)([-\u00ad])\n[ \t]*([a-zа-яё]\w*)")
+_COMPOUND = re.compile(r"\w+-\w+")
+_HYPHEN_WORDS = {"из-за", "из-под", "во-первых", "во-вторых", "в-третьих"}
+_HYPHEN_PREFIXES = {"кое", "кой"}                                  # кое-что
+_HYPHEN_SUFFIXES = {"то", "либо", "нибудь"}                         # что-то, кто-либо - только после местоимений
+_PRONOUNS = {"что", "кто", "где", "как", "куда", "когда", "откуда", "почему", "зачем", "чей", "чья", "чье",
+             "чего", "кого", "чему", "кому", "чем", "кем", "какой", "какая", "какое", "какие", "сколько"}
+_PO_ADVERB = re.compile(r"(?:ски|цки|ому|ему)$")                    # по-русски, по-новому
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_DIGITS = re.compile(r"\d+")
+
+def _line_key(line):
+    # "Глава 3 - стр. 12" и "Глава 3 - стр. 13" - один и тот же колонтитул
+    return _DIGITS.sub("#", line.strip().lower())
+
+def _edge_positions(lines):
+    """Индексы первых/последних EDGE_LINES непустых коротких строк страницы"""
+    idx = [i for i, l in enumerate(lines) if l.strip() and len(l) <= MAX_BOILERPLATE_LINE]
+    return set(idx[:EDGE_LINES] + idx[-EDGE_LINES:])
+
+def _edge_lines(page):
+    lines = page.splitlines()
+    return [lines[i] for i in sorted(_edge_positions(lines))]
+
+def strip_boilerplate(pages):
+    """Убирает колонтитулы (повторяющиеся на большой доле страниц) и номера страниц.
+    Кандидаты - только первые/последние EDGE_LINES строк страницы, тело не трогаем"""
+    counts = Counter()
+    for page in pages:
+        counts.update({_line_key(l) for l in _edge_lines(page)})
+    repeated = set()
+    if len(pages) >= MIN_PAGES_FOR_BOILERPLATE:
+        threshold = max(2, int(len(pages) * BOILERPLATE_PAGE_SHARE))
+        repeated = {k for k, n in counts.items() if n >= threshold}
+    out = []
+    for page in pages:
+        # Удаляем по позиции: та же фраза в теле страницы остается
+        lines = page.splitlines()
+        edges = _edge_positions(lines)
+        out.append("\n".join(l for i, l in enumerate(lines)
+                             if not (i in edges and (_PAGE_NUMBER.match(l) or _line_key(l) in repeated))))
+    return out
+
+def dedupe_paragraphs(text):
+    seen = set()
+    out = []
+    for para in text.split("\n\n"):
+        key = " ".join(para.split()).lower()
+        if len(key) >= MIN_DUP_PARAGRAPH:
+            if key in seen: continue
+            seen.add(key)
+        out.append(para)
+    return "\n\n".join(out)
+
+def join_hyphen_breaks(text):
+    """Перенос "сло-\nво" -> "слово". Дефис оставляем только у составных слов: из-за, кое-что, что-то,
+    слова с заглавной/цифрой (COVID-19, Wi-Fi) и формы, которые через дефис встречаются в самом тексте"""
+    hyphenated = None
+    def repl(m):
+        nonlocal hyphenated
+        left, sep, right = m.groups()
+        if sep == "\u00ad": return left + right
+        if hyphenated is None: hyphenated = {w.lower() for w in _COMPOUND.findall(text)}
+        word = f"{left}-{right}".lower()
+        keep = (not left.islower() or not right.islower() or word in _HYPHEN_WORDS or word in hyphenated
+                or left.lower() in _HYPHEN_PREFIXES or (right.lower() in _HYPHEN_SUFFIXES and left.lower() in _PRONOUNS)
+                or (left.lower() == "по" and _PO_ADVERB.search(right)))
+        return f"{left}-{right}" if keep else left + right
+    return _HYPHEN_BREAK.sub(repl, text)
+
+def normalize(text):
+    if not text: return ""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = join_hyphen_breaks(text)
+    text = text.replace("\u00ad", "")
+    pages = text.split(PAGE_BREAK)
+    text = "\n".join(strip_boilerplate(pages)) if len(pages) > 1 else pages[0]
+    text = "\n".join(_SPACES.sub(" ", l).strip() for l in text.split("\n"))
+    text = _BLANK_LINES.sub("\n\n", text)
+    return dedupe_paragraphs(text).strip()
+
+# --- ТОКЕНЫ ---
+@lru_cache(maxsize=8)
+def _encoding(model):
+    if not tiktoken: return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text, model="gpt-4o"):
+    enc = _encoding(model)
+    if enc: return len(enc.encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN_FALLBACK + 1
+
+def trim_to_tokens(text, budget, model="gpt-4o"):
+    """Обрезка ровно по бюджету токенов, по возможности - на границе абзаца/предложения"""
+    enc = _encoding(model)
+    if enc:
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) <= budget: return text
+        cut = enc.decode(tokens[:budget])
+    else:
+        limit = budget * CHARS_PER_TOKEN_FALLBACK
+        if len(text) <= limit: return text
+        cut = text[:limit]
+    # Не рвем предложение, если граница рядом (в последних 10%)
+    floor = int(len(cut) * 0.9)
+    for sep in ("\n\n", "\n", ". "):
+        pos = cut.rfind(sep)
+        if pos >= floor: return cut[:pos + (1 if sep == ". " else 0)].rstrip()
+    return cut
+
+def prepare(text, budget, model="gpt-4o", clean=None):
+    """Нормализация + бюджет токенов. Возвращает (текст, статистика).
+    clean - уже нормализованный text, если вызывающий нормализовал его сам"""
+    if clean is None: clean = normalize(text)
+    trimmed = trim_to_tokens(clean, budget, model)
+    stats = {"chars_in": len(text or ""), "chars_clean": len(clean), "chars_out": len(trimmed),
+             "tokens_out": count_tokens(trimmed, model)}
+    return trimmed, stats
@@ -0,0 +1,164 @@
+import sqlite3
+import time
+import uuid
+import math
+import contextvars
+from contextlib import contextmanager
+import metrics
+
+DB_FILE = "users.db"
+
+# --- ЦЕНЫ ---
+# USD за 1M токенов (вход, выход) и за минуту аудио
+TOKEN_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+AUDIO_PRICES = {"whisper-1": 0.006}
+DEFAULT_TOKEN_PRICE = TOKEN_PRICES["gpt-4o"]
+
+# --- КРЕДИТЫ ---
+# 1 кредит покрывает USD_PER_CREDIT расходов API, но не меньше MIN и не больше MAX за задачу
+USD_PER_CREDIT = 0.05
+MIN_CREDITS_PER_JOB = 1
+MAX_CREDITS_PER_JOB = 10
+
+_job = contextvars.ContextVar("vyud_job", default=(None, None))
+_ready = False
+
+def init_db():
+    global _ready
+    if _ready: return
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("""CREATE TABLE IF NOT EXISTS usage_ledger
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, email TEXT, job_id TEXT, kind TEXT,
+                  model TEXT, task TEXT, prompt_tokens INTEGER, completion_tokens INTEGER,
+                  audio_seconds REAL, cost_usd REAL, credits INTEGER)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_usage_email ON usage_ledger (email, ts)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_usage_job ON usage_ledger (job_id)")
+    # Одно списание на задачу: повторный запуск той же задачи не спишет кредиты второй раз
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_usage_charge ON usage_ledger (job_id) WHERE kind='charge'")
+    conn.commit()
+    conn.close()
+    _ready = True
+
+@contextmanager
+def job(email, job_id=None):
+    """Все вызовы API внутри блока пишутся в леджер на (email, job_id)"""
+    job_id = job_id or uuid.uuid4().hex[:12]
+    token = _job.set((email, job_id))
+    try:
+        yield job_id
+    finally:
+        _job.reset(token)
+
+def current_job():
+    return _job.get()
+
+def _insert(kind, model, task, prompt_tokens=0, completion_tokens=0, audio_seconds=0.0, cost_usd=0.0,
+            credits=0, email=None, job_id=None):
+    if email is None and job_id is None:
+        email, job_id = _job.get()
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        conn.execute("""INSERT INTO usage_ledger (ts, email, job_id, kind, model, task, prompt_tokens,
+                        completion_tokens, audio_seconds, cost_usd, credits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                     (time.time(), email, job_id, kind, model, task, prompt_tokens, completion_tokens,
+                      audio_seconds, cost_usd, credits))
+        conn.commit()
+    finally:
+        conn.close()
+
+# --- УЧЕТ ---
+def token_cost(model, prompt_tokens, completion_tokens):
+    p_in, p_out = TOKEN_PRICES.get(model, DEFAULT_TOKEN_PRICE)
+    return (prompt_tokens * p_in + completion_tokens * p_out) / 1_000_000
+
+def audio_cost(model, seconds):
+    return AUDIO_PRICES.get(model, AUDIO_PRICES["whisper-1"]) * seconds / 60
+
+def record_llm(model, task, usage, price_factor=1.0):
+    """response.usage чат-запроса -> строка леджера (price_factor - скидка, напр. Batch API)"""
+    if not usage: return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cost = token_cost(model, prompt_tokens, completion_tokens) * price_factor
+    metrics.inc("vyud_api_cost_usd_total", cost, model=model)
+    try:
+        _insert("llm", model, task, prompt_tokens, completion_tokens, cost_usd=cost)
+    except sqlite3.Error as e:
+        metrics.log_event("ledger_error", error=str(e))
+
+def record_audio(model, seconds, task="transcribe"):
+    if not seconds: return
+    cost = audio_cost(model, seconds)
+    metrics.inc("vyud_audio_seconds_total", seconds, model=model)
+    metrics.inc("vyud_api_cost_usd_total", cost, model=model)
+    try:
+        _insert("audio", model, task, audio_seconds=seconds, cost_usd=cost)
+    except sqlite3.Error as e:
+        metrics.log_event("ledger_error", error=str(e))
+
+def record_charge(email, job_id, credits):
+    """False - списание по этой задаче уже записано"""
+    try:
+        _insert("charge", None, None, credits=credits, email=email, job_id=job_id)
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+def job_charge(job_id):
+    """Сколько кредитов уже списано за задачу (None - не списывалось)"""
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute("SELECT credits FROM usage_ledger WHERE job_id=? AND kind='charge'", (job_id,)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def cancel_charge(job_id):
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("DELETE FROM usage_ledger WHERE job_id=? AND kind='charge'", (job_id,))
+    conn.commit()
+    conn.close()
+
+# --- ЦЕНООБРАЗОВАНИЕ ---
+def job_cost(job_id):
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT COALESCE(SUM(cost_usd), 0) FROM usage_ledger WHERE job_id=?", (job_id,))
+    cost = c.fetchone()[0]
+    conn.close()
+    return cost
+
+def credits_for_cost(cost_usd):
+    credits = math.ceil(cost_usd / USD_PER_CREDIT) if cost_usd > 0 else MIN_CREDITS_PER_JOB
+    return max(MIN_CREDITS_PER_JOB, min(MAX_CREDITS_PER_JOB, credits))
+
+def job_credits(job_id):
+    """Сколько кредитов стоит задача по фактическим расходам"""
+    return credits_for_cost(job_cost(job_id))
+
+# --- ОТЧЕТЫ ---
+def summary(since=None, limit=100):
+    """Сводка по пользователям для админки"""
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("""SELECT email,
+                        COUNT(DISTINCT job_id) AS jobs,
+                        SUM(prompt_tokens) AS prompt_tokens,
+                        SUM(completion_tokens) AS completion_tokens,
+                        ROUND(SUM(audio_seconds), 1) AS audio_seconds,
+                        ROUND(SUM(cost_usd), 4) AS cost_usd,
+                        SUM(credits) AS credits
+                 FROM usage_ledger WHERE ts >= ?
+                 GROUP BY email ORDER BY cost_usd DESC LIMIT ?""", (since or 0, limit))
+    cols = [d[0] for d in c.description]
+    rows = [dict(zip(cols, r)) for r in c.fetchall()]
+    conn.close()
+    return rows